@@ -0,0 +1,248 @@
+""" benchmark.py
+
+    Benchmarks the image preparation path with synthetic backdrops at the
+    common TMDB resolutions. Every variant runs in its own process, so the
+    peak RSS it reports belongs only to it.
+
+    Use it before changing image sizes or qualities in production:
+
+        $ python3 benchmark.py --iterations 20 --variants legacy fused
+
+    Author: João Iacillo <john@iacillo.dev.br>
+"""
+
+import argparse
+import resource
+from io import BytesIO
+from multiprocessing import get_context
+from statistics import quantiles
+from time import perf_counter
+
+from PIL import Image
+
+RESOLUTIONS = {
+    '720p':  (1280, 720),
+    '1080p': (1920, 1080),
+    '4k':    (3840, 2160),
+}
+
+VARIANTS = ('legacy', 'fused', 'budget-jpeg', 'budget-webp')
+
+
+def create_backdrop(size: tuple[int, int]) -> bytes:
+    """
+    Creates a JPEG that compresses roughly like a real backdrop: smooth
+    gradients with some grain on top.
+    """
+
+    red = Image.linear_gradient('L').resize(size)
+    green = Image.radial_gradient('L').resize(size)
+    blue = Image.effect_mandelbrot(size, (-2, -1.2, 1, 1.2), 64)
+    image = Image.merge('RGB', (red, green, blue))
+
+    grain = Image.effect_noise(size, 48).convert('RGB')
+    image = Image.blend(image, grain, 0.25)
+
+    output = BytesIO()
+    image.save(output, format='JPEG', quality=90)
+    return output.getvalue()
+
+
+def run_legacy(image_bytes: bytes, quality: int, censor_mode: str):
+    from bmg.image import MovieImage
+
+    image = MovieImage(image_bytes)
+    stages = {}
+
+    for name, step in (
+            ('optimize', lambda: image.optimize(quality)),
+            ('censor', lambda: image.censor(censor_mode)),
+            ('watermark', lambda: image.watermark()),
+    ):
+        start = perf_counter()
+        step()
+        stages[name] = (perf_counter() - start, len(image.to_bytes()))
+
+    return stages, image.to_bytes()
+
+
+def run_fused(
+        image_bytes: bytes,
+        quality: int,
+        censor_mode: str,
+        encoder=None
+):
+    from bmg.image import MovieImage
+
+    image = MovieImage(image_bytes)
+    timings = image.process(quality, encoder, censor_mode)
+    output = image.to_bytes()
+
+    stages = {
+        'decode':    (timings.decode, None),
+        'resize':    (timings.resize, None),
+        'censor':    (timings.censor, None),
+        'watermark': (timings.watermark, None),
+        'encode':    (timings.encode, len(output)),
+    }
+
+    return stages, output
+
+
+def run_variant(args: tuple) -> dict:
+    """ Runs inside a fresh process, see `main`. """
+
+    (variant, resolution, image_bytes, iterations, quality, censor_mode,
+     budget) = args
+
+    from bmg.image import BudgetEncoder
+
+    if variant == 'legacy':
+        def run():
+            return run_legacy(image_bytes, quality, censor_mode)
+    elif variant == 'fused':
+        def run():
+            return run_fused(image_bytes, quality, censor_mode)
+    else:
+        encoder = BudgetEncoder(budget, variant.split('-')[1], quality)
+
+        def run():
+            return run_fused(image_bytes, quality, censor_mode, encoder)
+
+    # The first run pays for imports and lazy initializations.
+    run()
+
+    stage_times: dict[str, list[float]] = {}
+    stage_bytes: dict[str, int] = {}
+    totals = []
+    output_size = 0
+
+    for _ in range(iterations):
+        start = perf_counter()
+        stages, output = run()
+        totals.append(perf_counter() - start)
+        output_size = len(output)
+
+        for name, (elapsed, size) in stages.items():
+            stage_times.setdefault(name, []).append(elapsed)
+            stage_bytes[name] = size
+
+    return {
+        'variant':     variant,
+        'resolution':  resolution,
+        'input_size':  len(image_bytes),
+        'stages':      {name: (percentiles(times), stage_bytes[name])
+                        for name, times in stage_times.items()},
+        'total':       percentiles(totals),
+        'output_size': output_size,
+        'peak_rss':    peak_rss(),
+    }
+
+
+def peak_rss() -> int:
+    """ Peak resident memory of the current process, in kilobytes. """
+
+    # Linux keeps ru_maxrss across exec, so a spawned process would report
+    # the peak of its parent. VmHWM starts fresh with the new process.
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def percentiles(times: list[float]) -> tuple[float, float]:
+    """ Returns the p50 and p95 of `times`, in milliseconds. """
+
+    if len(times) == 1:
+        return times[0] * 1000, times[0] * 1000
+
+    cuts = quantiles(times, n=100, method='inclusive')
+    return cuts[49] * 1000, cuts[94] * 1000
+
+
+def print_result(result: dict):
+    print(
+            f'\n{result["variant"]} @ {result["resolution"]} '
+            f'(input {result["input_size"] / 1024:.0f}KB)'
+    )
+    print(f'  {"stage":<10} {"p50":>9} {"p95":>9} {"bytes":>10}')
+
+    for name, ((p50, p95), size) in result['stages'].items():
+        size = '-' if size is None else f'{size}'
+        print(f'  {name:<10} {p50:>7.1f}ms {p95:>7.1f}ms {size:>10}')
+
+    p50, p95 = result['total']
+    print(
+            f'  {"total":<10} {p50:>7.1f}ms {p95:>7.1f}ms '
+            f'{result["output_size"]:>10}'
+    )
+    print(f'  peak RSS: {result["peak_rss"] / 1024:.1f}MB')
+
+
+def print_comparison(results: list[dict]):
+    """ Prints the end to end numbers of every variant side by side. """
+
+    print(
+            f'\n{"variant":<12} {"res":<6} {"p50":>9} {"p95":>9} '
+            f'{"bytes":>10} {"rss":>8}'
+    )
+
+    for result in results:
+        p50, p95 = result['total']
+        print(
+                f'{result["variant"]:<12} {result["resolution"]:<6} '
+                f'{p50:>7.1f}ms {p95:>7.1f}ms {result["output_size"]:>10} '
+                f'{result["peak_rss"] / 1024:>6.1f}MB'
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[2])
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--quality', type=int, default=75)
+    parser.add_argument('--censor-mode', default='canvas')
+    parser.add_argument('--budget', type=int, default=980_000)
+    parser.add_argument(
+            '--resolutions',
+            nargs='+',
+            choices=RESOLUTIONS.keys(),
+            default=list(RESOLUTIONS.keys())
+    )
+    parser.add_argument(
+            '--variants',
+            nargs='+',
+            choices=VARIANTS,
+            default=list(VARIANTS)
+    )
+    args = parser.parse_args()
+
+    # Backdrops are created up front, so the work of creating them doesn't
+    # count in the peak RSS of the variants.
+    backdrops = {resolution: create_backdrop(RESOLUTIONS[resolution])
+                 for resolution in args.resolutions}
+
+    jobs = [
+        (variant, resolution, backdrops[resolution], args.iterations,
+         args.quality, args.censor_mode, args.budget)
+        for resolution in args.resolutions
+        for variant in args.variants
+    ]
+
+    results = []
+
+    # A new process per job keeps the peak RSS of each variant apart.
+    with get_context('spawn').Pool(1, maxtasksperchild=1) as pool:
+        for result in pool.imap(run_variant, jobs):
+            print_result(result)
+            results.append(result)
+
+    print_comparison(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+""" benchmark_matcher.py
+
+    Microbenchmark of `Match.clean` against the implementation it replaced,
+    with a mix of replies like the ones the bot gets: typos, accents,
+    emojis, symbols and repeated guesses.
+
+        $ python3 benchmark_matcher.py --replies 20000
+
+    Author: João Iacillo <john@iacillo.dev.br>
+"""
+
+import argparse
+from random import Random
+from timeit import repeat
+
+from bmg.matcher import Match, _clean
+
+SAMPLES = (
+    'The Lord of the Rings: The Fellowship of the Ring',
+    'amélie!!',
+    '  Spider-Man:   No Way Home 🕷️  ',
+    'WALL·E',
+    'Star Wars: Episode IV – A New Hope',
+    'o fabuloso destino de amélie poulain',
+    'Léon: The Professional',
+    'harry potter e a pedra filosofal?',
+    '#Oppenheimer 💣💥',
+    'Crouching Tiger, Hidden Dragon (臥虎藏龍)',
+)
+
+
+def legacy_clean(string: str) -> str:
+    """ `Match.clean` before the compiled normalizer. """
+
+    cleaned = string.strip()
+    cleaned = ''.join(c for c in cleaned if c.isalnum() or c.isspace())
+    cleaned = cleaned.lower().split()
+
+    return ' '.join(cleaned)
+
+
+def create_replies(count: int, unique: float) -> list[str]:
+    rng = Random(0)
+    distinct = [f'{rng.choice(SAMPLES)} {i}' for i in
+                range(max(1, int(count * unique)))]
+    return [rng.choice(distinct) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[2])
+    parser.add_argument('--replies', type=int, default=20000)
+    parser.add_argument(
+            '--unique',
+            type=float,
+            default=0.3,
+            help='Share of the replies that are distinct strings'
+    )
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    replies = create_replies(args.replies, args.unique)
+
+    def run_legacy():
+        for reply in replies:
+            legacy_clean(reply)
+
+    def run_cold():
+        _clean.cache_clear()
+        for reply in replies:
+            Match.clean(reply)
+
+    def run_warm():
+        for reply in replies:
+            Match.clean(reply)
+
+    run_warm()
+
+    for name, run in (
+            ('legacy', run_legacy),
+            ('compiled (cold cache)', run_cold),
+            ('compiled (warm cache)', run_warm),
+    ):
+        best = min(repeat(run, number=1, repeat=args.repeat))
+        print(
+                f'{name:<22} {best * 1000:>8.1f}ms '
+                f'{best / len(replies) * 1e9:>8.0f}ns/reply'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+""" backdrops.py
+
+    Most movies TMDB gives us don't have enough backdrops for a round, and
+    finding that out costs an images request every time. This index keeps
+    the backdrops of every movie we've looked at, including the ones with
+    too few of them, so that the same movie never costs a request twice
+    while its entry is fresh.
+
+    Author: João Iacillo <john@iacillo.dev.br>
+"""
+
+import json
+import sqlite3
+from logging import Logger
+from threading import Lock
+from time import time
+from typing import Union
+
+# Only these keys of each backdrop are kept in the index.
+BACKDROP_KEYS = ('file_path', 'width', 'height')
+
+
+class BackdropIndex:
+    def __init__(self, file: str, logger: Logger, ttl_days: float = 7):
+        self.file = file
+        self.logger = logger
+        self.ttl = ttl_days * 24 * 60 * 60
+
+        # Same as the catalog, it's used from the prefetcher thread.
+        self.con = sqlite3.connect(self.file, check_same_thread=False)
+        self.cursor = self.con.cursor()
+        self.lock = Lock()
+
+        self._create_table()
+        self.prune()
+
+    def _create_table(self):
+        query = """
+        CREATE TABLE IF NOT EXISTS backdrops (
+            MOVIE_ID    INTEGER PRIMARY KEY,
+            COUNT       INTEGER,
+            BACKDROPS   TEXT,
+            FETCHED_IN  REAL
+        )
+        """
+
+        self.cursor.execute(query)
+        self.con.commit()
+
+    def get(self, movie_id: int) -> Union[list[dict], None]:
+        """
+        Returns the indexed backdrops of a movie, or None if the movie isn't
+        indexed or its entry has expired.
+        """
+
+        with self.lock:
+            self.cursor.execute(
+                    'SELECT BACKDROPS FROM backdrops '
+                    'WHERE MOVIE_ID=? AND FETCHED_IN>?',
+                    (movie_id, time() - self.ttl)
+            )
+            data = self.cursor.fetchone()
+
+        return json.loads(data[0]) if data else None
+
+    def put(self, movie_id: int, backdrops: list[dict]) -> None:
+        slim = [{key: backdrop.get(key) for key in BACKDROP_KEYS}
+                for backdrop in backdrops]
+
+        with self.lock:
+            self.cursor.execute(
+                    'INSERT OR REPLACE INTO backdrops '
+                    '(MOVIE_ID, COUNT, BACKDROPS, FETCHED_IN) '
+                    'VALUES (?, ?, ?, ?)',
+                    (movie_id, len(slim), json.dumps(slim), time())
+            )
+            self.con.commit()
+
+    def has_too_few(self, movie_id: int, n: int) -> bool:
+        """ Whether a movie is known to have fewer than `n` backdrops. """
+
+        with self.lock:
+            self.cursor.execute(
+                    'SELECT COUNT FROM backdrops '
+                    'WHERE MOVIE_ID=? AND FETCHED_IN>?',
+                    (movie_id, time() - self.ttl)
+            )
+            data = self.cursor.fetchone()
+
+        return data is not None and data[0] < n
+
+    def prune(self) -> None:
+        """ Deletes every expired entry. """
+
+        with self.lock:
+            self.cursor.execute(
+                    'DELETE FROM backdrops WHERE FETCHED_IN<=?',
+                    (time() - self.ttl,)
+            )
+            pruned = self.cursor.rowcount
+            self.con.commit()
+
+        if pruned > 0:
+            self.logger.info(f'Pruned {pruned} expired backdrop entries')
@@ -0,0 +1,139 @@
+""" blobcache.py
+
+    Content-addressed disk cache for the images of a round: the originals
+    downloaded from TMDB and the prepared ones. Keys are built from what
+    produced the blob (the TMDB file path, the pipeline parameters, ...), so
+    a retry or re-run costs a disk read instead of a download and an encode.
+
+    The least recently used blobs are evicted when the cache gets bigger
+    than its size cap. Writes are atomic, a crash never leaves half a blob.
+
+    Author: João Iacillo <john@iacillo.dev.br>
+"""
+
+import json
+from hashlib import sha256
+from logging import Logger
+from os import makedirs, path, remove, replace, scandir, utime
+from tempfile import NamedTemporaryFile
+from threading import Lock
+from typing import Union
+
+from bmg.consts import ROOT_DIR
+
+BLOB_CACHE_DIR = path.join(ROOT_DIR, '.cache', 'blobs')
+
+
+class BlobCache:
+    def __init__(
+            self,
+            max_bytes: int,
+            logger: Logger,
+            directory: str = BLOB_CACHE_DIR
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.logger = logger
+        self.lock = Lock()
+
+        makedirs(self.directory, exist_ok=True)
+
+        # file -> (size, last use), loaded once and kept in sync afterwards.
+        self.entries: dict[str, tuple[int, float]] = {}
+        for entry in self._scan():
+            stat = entry.stat()
+            self.entries[entry.path] = (stat.st_size, stat.st_mtime)
+        self.size = sum(size for size, _ in self.entries.values())
+
+        self.logger.info(
+                f'Blob cache in "{self.directory}" using '
+                f'{self.size / 1024 / 1024:.1f}MB of '
+                f'{self.max_bytes / 1024 / 1024:.0f}MB'
+        )
+
+    def _scan(self):
+        for shard in scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in scandir(shard.path):
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    yield entry
+
+    @staticmethod
+    def key(namespace: str, **params) -> str:
+        """
+        Creates the key of a blob from its namespace and every parameter
+        that affects its content.
+        """
+
+        encoded = json.dumps(params, sort_keys=True, default=str)
+        return sha256(f'{namespace}:{encoded}'.encode()).hexdigest()
+
+    def _file(self, key: str) -> str:
+        return path.join(self.directory, key[:2], key)
+
+    def get(self, key: str) -> Union[bytes, None]:
+        file = self._file(key)
+
+        try:
+            with open(file, 'rb') as blob:
+                data = blob.read()
+        except FileNotFoundError:
+            return None
+
+        # The modification time is the last use, it's what LRU goes by.
+        try:
+            utime(file)
+        except FileNotFoundError:
+            return data
+
+        with self.lock:
+            if file in self.entries:
+                self.entries[file] = (self.entries[file][0],
+                                      path.getmtime(file))
+
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+
+        file = self._file(key)
+        makedirs(path.dirname(file), exist_ok=True)
+
+        with NamedTemporaryFile(
+                dir=path.dirname(file),
+                suffix='.tmp',
+                delete=False
+        ) as tmp:
+            tmp.write(data)
+        replace(tmp.name, file)
+
+        with self.lock:
+            old_size = self.entries.get(file, (0, 0))[0]
+            self.entries[file] = (len(data), path.getmtime(file))
+            self.size += len(data) - old_size
+            self._evict()
+
+    def _evict(self) -> None:
+        if self.size <= self.max_bytes:
+            return
+
+        evicted = 0
+        for file, (size, _) in sorted(
+                self.entries.items(),
+                key=lambda item: item[1][1]
+        ):
+            if self.size <= self.max_bytes:
+                break
+
+            try:
+                remove(file)
+            except FileNotFoundError:
+                pass
+
+            del self.entries[file]
+            self.size -= size
+            evicted += 1
+
+        self.logger.debug(f'Blob cache evicted {evicted} blobs')
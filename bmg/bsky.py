@@ -5,27 +5,286 @@
     Author: João Iacillo <john@iacillo.dev.br>
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from logging import Logger
+from os import makedirs, path, replace
+from tempfile import NamedTemporaryFile
+from time import perf_counter
+from typing import Iterator, Union
 
-from atproto import Client
+from atproto import Client, Session, SessionEvent, models
+from atproto.exceptions import AtProtocolError
+
+from bmg.ratelimit import (
+    ObservedRequest, WriteCost, WritePriority, WriteScheduler
+)
+
+# applyWrites takes at most 200 operations per call.
+LIKES_PER_WRITE = 200
 
 
 class BskyClient:
-    def __init__(self, handle: str, password: str, logger: Logger):
-        self.client = Client()
+    def __init__(
+            self,
+            handle: str,
+            password: str,
+            logger: Logger,
+            session_file: Union[str, None] = None,
+            scheduler: WriteScheduler = None
+    ):
         self.logger = logger
+        self.session_file = session_file
+
+        # Every call goes through the scheduler, which learns the remaining
+        # write points from the responses.
+        self.scheduler = scheduler or WriteScheduler(logger)
+        self.client = Client(request=ObservedRequest(self.scheduler.update))
+
+        # The client refreshes the access token by itself a few minutes
+        # before it expires, every new token is saved for the next start.
+        if self.session_file:
+            self.client.on_session_change(self._save_session)
+
+        if not self._resume_session(handle):
+            self.client.login(handle, password)
 
-        self.client.login(handle, password)
         self.logger.info(f'Bsky client logged in as @{self.client.me.handle}')
 
+    @staticmethod
+    def _session_matches(session: Session, login: str) -> bool:
+        """
+        Whether `session` belongs to the account of `login`, which can be a
+        handle, a DID or an email. Sessions don't know the email, so those
+        always match.
+        """
+
+        login = login.lower().lstrip('@')
+
+        if login.startswith('did:'):
+            return session.did.lower() == login
+        if '@' in login:
+            return True
+        return session.handle.lower() == login
+
+    def _resume_session(self, handle: str) -> bool:
+        """
+        Logs in with the saved session, if there's one for `handle`, which
+        can also be the DID or the email of the account. An expired access
+        token is refreshed on the first request. Returns False when a
+        password login is needed.
+        """
+
+        if not self.session_file or not path.isfile(self.session_file):
+            return False
+
+        with open(self.session_file, encoding='utf-8') as file:
+            session_string = file.read().strip()
+
+        try:
+            session = Session.decode(session_string)
+        except ValueError:
+            self.logger.warning('Saved Bsky session is invalid, logging in')
+            return False
+
+        if not self._session_matches(session, handle):
+            self.logger.info('Saved Bsky session is for another account')
+            return False
+
+        try:
+            self.client.login(session_string=session_string)
+        except AtProtocolError as err:
+            self.logger.warning(
+                    f'Could not resume the saved Bsky session, logging in: '
+                    f'{err.__class__.__name__}'
+            )
+            return False
+
+        self.logger.info('Resumed the saved Bsky session')
+        return True
+
+    def _save_session(self, event: SessionEvent, session: Session):
+        if event == SessionEvent.IMPORT:
+            return
+
+        directory = path.dirname(path.abspath(self.session_file))
+        makedirs(directory, exist_ok=True)
+
+        # Temporary files are only readable by their owner, and the session
+        # is as good as a password.
+        with NamedTemporaryFile(
+                'w',
+                dir=directory,
+                suffix='.tmp',
+                delete=False,
+                encoding='utf-8'
+        ) as tmp:
+            tmp.write(session.export())
+        replace(tmp.name, self.session_file)
+
+        self.logger.debug(f'Bsky session saved ({event.name.lower()})')
+
     def post(self, content: str):
-        return self.client.send_post(content)
+        return self.scheduler.run(self.client.send_post, content)
+
+    def upload_images(
+            self,
+            images: list[bytes]
+    ) -> list[models.AppBskyEmbedImages.Image]:
+        """
+        Uploads every image at the same time. The returned refs can be
+        posted later with `post_uploaded_images`, but the PDS discards
+        blobs that no record references for a while, so don't hold them
+        for long.
+        """
+
+        start = perf_counter()
+
+        with ThreadPoolExecutor(max_workers=max(1, len(images))) as executor:
+            uploads = list(executor.map(self._upload_blob, images))
+
+        self.logger.info(
+                f'Uploaded {len(images)} images in '
+                f'{perf_counter() - start:.3f}s'
+        )
+
+        return [models.AppBskyEmbedImages.Image(alt='', image=upload.blob)
+                for upload in uploads]
+
+    def _upload_blob(self, image: bytes):
+        return self.scheduler.run(
+                self.client.upload_blob,
+                image,
+                cost=WriteCost.READ
+        )
+
+    def post_uploaded_images(
+            self,
+            content: str,
+            images: list[models.AppBskyEmbedImages.Image]
+    ):
+        return self.scheduler.run(
+                self.client.send_post,
+                content,
+                embed=models.AppBskyEmbedImages.Main(images=images)
+        )
 
     def post_images(self, content: str, images: list[bytes]):
-        return self.client.send_images(content, images=images)
+        return self.post_uploaded_images(content, self.upload_images(images))
+
+    def iter_replies(
+            self,
+            uri: str
+    ) -> Iterator[models.AppBskyFeedDefs.PostView]:
+        """
+        Yields the top-level replies of a post. Replies that aren't post
+        views (blocked or deleted posts) are skipped, and so are repeated
+        ones.
+
+        getPostThread has no cursor, so this is a single request and the
+        whole response is loaded before the first reply is yielded. Only
+        direct replies are requested, without parents, which keeps it as
+        small as the AppView allows. Replies the AppView leaves out of the
+        thread are not found. Set BSKY_JETSTREAM_URL to receive every reply
+        while the round runs.
+        """
+
+        start = perf_counter()
+        collected = 0
+        skipped = 0
+
+        response = self.scheduler.run(
+                self.client.get_post_thread,
+                uri,
+                depth=1,
+                parent_height=0,
+                cost=WriteCost.READ
+        )
+        thread = response.thread
+
+        if not isinstance(thread, models.AppBskyFeedDefs.ThreadViewPost):
+            self.logger.warning(f'Thread {uri} is not available')
+            return
+
+        seen: set[str] = set()
+
+        for reply in thread.replies or []:
+            if not isinstance(reply, models.AppBskyFeedDefs.ThreadViewPost) \
+                    or reply.post.uri in seen:
+                skipped += 1
+                continue
+
+            seen.add(reply.post.uri)
+            collected += 1
+            yield reply.post
+
+        self.logger.info(
+                f'Collected {collected} replies ({skipped} skipped) in '
+                f'{perf_counter() - start:.3f}s'
+        )
+
+    def like_many(self, posts: list[tuple[str, str]]) -> int:
+        """
+        Likes every post of a list of (uri, cid) pairs. The like records are
+        written in chunks through a single applyWrites call each, instead of
+        one request per like.
+
+        Likes have the lowest priority in the scheduler, they never delay
+        the posts of a round. Returns how many posts were liked.
+        """
+
+        start = perf_counter()
+        liked = 0
+
+        for i in range(0, len(posts), LIKES_PER_WRITE):
+            chunk = posts[i:i + LIKES_PER_WRITE]
+            if self._apply_likes(chunk):
+                liked += len(chunk)
+
+        self.logger.info(
+                f'Liked {liked}/{len(posts)} posts in '
+                f'{perf_counter() - start:.3f}s'
+        )
+        return liked
+
+    def _apply_likes(self, posts: list[tuple[str, str]]) -> bool:
+        now = self.client.get_current_time_iso()
+        writes = [
+            models.ComAtprotoRepoApplyWrites.Create(
+                    collection='app.bsky.feed.like',
+                    value=models.AppBskyFeedLike.Record(
+                            created_at=now,
+                            subject=models.ComAtprotoRepoStrongRef.Main(
+                                    uri=uri,
+                                    cid=cid
+                            )
+                    )
+            )
+            for uri, cid in posts
+        ]
+        data = models.ComAtprotoRepoApplyWrites.Data(
+                repo=self.client.me.did,
+                writes=writes
+        )
+
+        try:
+            self.scheduler.run(
+                    self.client.com.atproto.repo.apply_writes,
+                    data,
+                    cost=WriteCost.CREATE * len(writes),
+                    priority=WritePriority.LIKE
+            )
+        except AtProtocolError as err:
+            self.logger.error(
+                    f'Could not like {len(posts)} posts',
+                    exc_info=err
+            )
+            return False
 
-    def get_thread(self, uri: str):
-        return self.client.get_post_thread(uri, 1)
+        return True
 
     def delete_post(self, uri: str):
-        return self.client.delete_post(uri)
+        return self.scheduler.run(
+                self.client.delete_post,
+                uri,
+                cost=WriteCost.DELETE
+        )
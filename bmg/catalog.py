@@ -0,0 +1,199 @@
+""" catalog.py
+
+    TMDB publishes a daily export with the IDs of every movie they have,
+    one JSON object per line, gzipped. This file imports that export into a
+    SQLite table, so that random movies can be selected locally without
+    calling the discover endpoint for each candidate.
+
+    Movies are weighted by their popularity, so well known titles are picked
+    way more often than obscure ones. Still, the export has about a million
+    movies and most of them are obscure, so together they would outweigh the
+    popular ones. Only the `DEFAULT_MAX_MOVIES` most popular are selectable
+    by default, many of the others don't even have enough backdrops.
+
+    You can download the exports from:
+    https://developer.themoviedb.org/docs/daily-id-exports
+
+    Author: João Iacillo <john@iacillo.dev.br>
+"""
+
+import gzip
+import heapq
+import json
+import sqlite3
+from logging import Logger
+from random import random
+from threading import Lock
+from typing import Iterator, Union
+
+# Rows are inserted in batches of this size while streaming the export.
+IMPORT_BATCH_SIZE = 10_000
+
+# How many of the most popular movies can be selected. The discover
+# endpoint, used without a catalog, picks among the 1000 most popular.
+DEFAULT_MAX_MOVIES = 10_000
+
+
+class MovieCatalog:
+    def __init__(self, file: str, logger: Logger):
+        self.file = file
+        self.logger = logger
+
+        # The catalog has its own connection, since the prefetcher thread
+        # selects movies while the game thread uses the main one.
+        self.con = sqlite3.connect(self.file, check_same_thread=False)
+        self.cursor = self.con.cursor()
+        self.lock = Lock()
+
+        self.total_weight: Union[float, None] = None
+
+        self._create_table()
+
+    def _create_table(self):
+        query = """
+        CREATE TABLE IF NOT EXISTS catalog (
+            ID              INTEGER PRIMARY KEY,
+            ORIGINAL_TITLE  TEXT,
+            POPULARITY      REAL,
+            ADULT           INTEGER,
+            CUM_WEIGHT      REAL
+        )
+        """
+
+        self.cursor.execute(query)
+
+        # Only selectable movies have a cumulative weight, so the index
+        # doesn't carry adult or unpopular movies.
+        self.cursor.execute(
+                'CREATE INDEX IF NOT EXISTS catalog_cum_weight '
+                'ON catalog (CUM_WEIGHT) WHERE CUM_WEIGHT IS NOT NULL'
+        )
+        self.con.commit()
+
+    @staticmethod
+    def read_export(file: str) -> Iterator[dict]:
+        """
+        Streams the movies of a TMDB daily ID export. Both gzipped and plain
+        JSON lines files are accepted.
+        """
+
+        opener = gzip.open if file.endswith('.gz') else open
+
+        with opener(file, 'rt', encoding='utf-8') as export:
+            for line in export:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+    def import_export(
+            self,
+            file: str,
+            min_popularity: float = 0,
+            max_movies: int = DEFAULT_MAX_MOVIES
+    ) -> int:
+        """
+        Replaces the catalog with the movies of a TMDB daily ID export.
+
+        Only the `max_movies` most popular movies can be selected, all of
+        them when it's 0. Adult movies, videos, movies under
+        `min_popularity` and the ones after the most popular are kept, but
+        never selected. Returns how many movies can be selected.
+        """
+
+        self.logger.info(f'Importing TMDB export "{file}" into the catalog')
+
+        # (popularity, id) of the most popular movies, the least popular on
+        # top, so the export is streamed in a single pass.
+        selectable: list[tuple[float, int]] = []
+        batch = []
+
+        with self.lock:
+            self.cursor.execute('DELETE FROM catalog')
+
+            for movie in self.read_export(file):
+                popularity = float(movie.get('popularity') or 0)
+                adult = bool(movie.get('adult'))
+
+                if not adult and not movie.get('video') and \
+                        popularity > 0 and popularity >= min_popularity:
+                    entry = (popularity, movie['id'])
+                    if not max_movies or len(selectable) < max_movies:
+                        heapq.heappush(selectable, entry)
+                    elif entry > selectable[0]:
+                        heapq.heapreplace(selectable, entry)
+
+                batch.append((
+                    movie['id'],
+                    movie.get('original_title'),
+                    popularity,
+                    int(adult),
+                    None
+                ))
+
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    self._insert(batch)
+                    batch = []
+
+            self._insert(batch)
+
+            cum_weight = 0.0
+            weights = []
+            for popularity, movie_id in selectable:
+                cum_weight += popularity
+                weights.append((cum_weight, movie_id))
+
+            self.cursor.executemany(
+                    'UPDATE catalog SET CUM_WEIGHT=? WHERE ID=?',
+                    weights
+            )
+            self.con.commit()
+
+            self.total_weight = cum_weight if selectable else None
+
+        self.logger.info(
+                f'Catalog imported with {len(selectable)} selectable movies'
+        )
+        return len(selectable)
+
+    def _insert(self, batch: list[tuple]):
+        self.cursor.executemany(
+                'INSERT OR REPLACE INTO catalog '
+                '(ID, ORIGINAL_TITLE, POPULARITY, ADULT, CUM_WEIGHT) '
+                'VALUES (?, ?, ?, ?, ?)',
+                batch
+        )
+
+    def _get_total_weight(self) -> Union[float, None]:
+        if self.total_weight is None:
+            # MAX() over an indexed column is a single index lookup.
+            self.cursor.execute(
+                    'SELECT MAX(CUM_WEIGHT) FROM catalog '
+                    'WHERE CUM_WEIGHT IS NOT NULL'
+            )
+            self.total_weight = self.cursor.fetchone()[0]
+        return self.total_weight
+
+    def is_empty(self) -> bool:
+        with self.lock:
+            return self._get_total_weight() is None
+
+    def random_movie(self) -> Union[tuple[int, str], None]:
+        """
+        Picks a random movie weighted by popularity. It's a single index
+        seek, so it stays as fast with hundreds of thousands of movies.
+
+        Returns the movie ID and original title, or None if the catalog is
+        empty.
+        """
+
+        with self.lock:
+            total = self._get_total_weight()
+            if total is None:
+                return None
+
+            self.cursor.execute(
+                    'SELECT ID, ORIGINAL_TITLE FROM catalog '
+                    'WHERE CUM_WEIGHT > ? ORDER BY CUM_WEIGHT LIMIT 1',
+                    (random() * total,)
+            )
+            return self.cursor.fetchone()
@@ -6,3 +6,6 @@
 from os import path
 
 ROOT_DIR = path.dirname(path.dirname(path.abspath(__file__)))
+
+# Images posted to Bsky are never bigger than this.
+IMAGE_MAX_SIZE = (1280, 720)
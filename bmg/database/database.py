@@ -1,22 +1,47 @@
 import sqlite3
 from logging import Logger
 
+from .guesses import Guesses
+from .migrations import migrate
+from .pending import PendingRounds
 from .posts import Posts
 from .rounds import Rounds
 
+PRAGMAS = (
+    # Readers, like the catalog and backdrop connections, don't block the
+    # game writes and the other way around. It's kept in the database file.
+    'PRAGMA journal_mode = WAL',
+    # Safe with WAL, only the last commits can be lost on a power failure.
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA busy_timeout = 5000',
+    'PRAGMA temp_store = MEMORY',
+)
+
 
 class Database:
     def __init__(self, file: str, logger: Logger):
         self.file = file
         self.logger = logger
 
+        # Every query of the game is a constant string, so each one is only
+        # prepared once and reused from the connection's statement cache.
         self.con = sqlite3.connect(self.file)
         self.cursor = self.con.cursor()
         self.logger.info(f'SQLite3 database connected in "{self.file}"')
 
+        for pragma in PRAGMAS:
+            self.con.execute(pragma)
+
+        version = migrate(self.con, self.logger)
+        self.logger.debug(f'Database schema version: {version}')
+
+        # Can only be enabled once the migrations, that rebuild tables, ran.
+        self.con.execute('PRAGMA foreign_keys = ON')
+
         self.posts = Posts(self.con, self.cursor)
         self.rounds = Rounds(self.con, self.cursor)
-        # self.cursor.execute('PRAGMA foreign_keys = ON;')
+        self.guesses = Guesses(self.con, self.cursor)
+        self.pending = PendingRounds(self.con, self.cursor)
 
     def commit(self):
         self.con.commit()
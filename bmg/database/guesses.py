@@ -0,0 +1,89 @@
+from dataclasses import dataclass
+from sqlite3 import Connection, Cursor
+from typing import Iterable, Iterator
+
+from bmg.database.types import PostUri
+
+# Rows are read from SQLite in batches of this size while streaming.
+FETCH_BATCH_SIZE = 1000
+
+
+@dataclass
+class GuessModel:
+    rowid: int
+    round: int
+    author: str
+    uri: PostUri
+    cid: str
+    text: str
+    """ Guess text after `Match.clean`. """
+    score: int
+    correct: bool
+    counted: bool
+    """ Whether the attempt policy counted the guess as an attempt. """
+    created_in: str
+
+
+class Guesses:
+    def __init__(self, con: Connection, cursor: Cursor):
+        self.con = con
+        self.cursor = cursor
+
+    def create_many(self, rows: Iterable[tuple]):
+        """
+        Inserts every guess of a round with a single statement. Each row is
+        (ROUND, AUTHOR, URI, CID, TEXT, SCORE, CORRECT, COUNTED, CREATED_IN).
+
+        Nothing is committed, so the guesses land in the same transaction
+        as the results of the round.
+        """
+
+        query = """
+        INSERT INTO guesses
+            (ROUND, AUTHOR, URI, CID, TEXT, SCORE, CORRECT, COUNTED,
+             CREATED_IN)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """
+
+        self.cursor.executemany(query, rows)
+
+    def _stream(self, query: str, params: tuple) -> Iterator[GuessModel]:
+        # A cursor of its own, so the game can keep using the shared one
+        # while the rows are being consumed.
+        cursor = self.con.cursor()
+        cursor.execute(query, params)
+
+        try:
+            while True:
+                rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+                if not rows:
+                    return
+
+                for (rowid, num, author, uri, cid, text, score, correct,
+                     counted, created_in) in rows:
+                    yield GuessModel(rowid, num, author, uri, cid, text,
+                                     score, bool(correct), bool(counted),
+                                     created_in)
+        finally:
+            cursor.close()
+
+    def iter_by_round(self, num: int) -> Iterator[GuessModel]:
+        return self._stream(
+                'SELECT ID, ROUND, AUTHOR, URI, CID, TEXT, SCORE, CORRECT, '
+                'COUNTED, CREATED_IN FROM guesses WHERE ROUND=? ORDER BY ID',
+                (num,)
+        )
+
+    def iter_by_author(self, author: str) -> Iterator[GuessModel]:
+        return self._stream(
+                'SELECT ID, ROUND, AUTHOR, URI, CID, TEXT, SCORE, CORRECT, '
+                'COUNTED, CREATED_IN FROM guesses WHERE AUTHOR=? ORDER BY ID',
+                (author,)
+        )
+
+    def iter_all(self) -> Iterator[GuessModel]:
+        return self._stream(
+                'SELECT ID, ROUND, AUTHOR, URI, CID, TEXT, SCORE, CORRECT, '
+                'COUNTED, CREATED_IN FROM guesses ORDER BY ID',
+                ()
+        )
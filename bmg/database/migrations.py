@@ -0,0 +1,161 @@
+""" migrations.py
+
+    Versioned schema of the game tables. The version of a database file is
+    kept in SQLite's `user_version`, and every migration after it runs in a
+    single transaction on startup, so an old database is brought up to date
+    and a new one is created from scratch the same way.
+
+    Never change a migration that was already released, add a new one.
+
+    Author: João Iacillo <john@iacillo.dev.br>
+"""
+
+from logging import Logger
+from sqlite3 import Connection
+
+MIGRATIONS: tuple[tuple[str, ...], ...] = (
+    # 1: Tables as they were before migrations existed.
+    (
+        """
+        CREATE TABLE IF NOT EXISTS posts (
+            ROUND_URI   TEXT,
+            ERROR_URI   TEXT,
+            END_URI     TEXT,
+            RESULTS_URI TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS rounds (
+            NUM         INTEGER PRIMARY KEY,
+            STATE       INTEGER,
+            MOVIE       TEXT,
+            POSTS       INTEGER,
+            PERCENT     INTEGER,
+            ATTEMPTS    INTEGER,
+            CREATED_IN  TEXT,
+            ENDED_IN    TEXT,
+
+            FOREIGN KEY (POSTS) REFERENCES posts (rowid)
+        )
+        """,
+    ),
+    # 2: A foreign key can't reference the implicit rowid, so posts get an
+    # explicit ID that aliases it and keeps every existing rowid.
+    (
+        """
+        CREATE TABLE posts_new (
+            ID          INTEGER PRIMARY KEY,
+            ROUND_URI   TEXT,
+            ERROR_URI   TEXT,
+            END_URI     TEXT,
+            RESULTS_URI TEXT
+        )
+        """,
+        """
+        INSERT INTO posts_new (ID, ROUND_URI, ERROR_URI, END_URI, RESULTS_URI)
+            SELECT rowid, ROUND_URI, ERROR_URI, END_URI, RESULTS_URI
+            FROM posts
+        """,
+        'DROP TABLE posts',
+        'ALTER TABLE posts_new RENAME TO posts',
+        """
+        CREATE TABLE rounds_new (
+            NUM         INTEGER PRIMARY KEY,
+            STATE       INTEGER,
+            MOVIE       TEXT,
+            POSTS       INTEGER,
+            PERCENT     INTEGER,
+            ATTEMPTS    INTEGER,
+            CREATED_IN  TEXT,
+            ENDED_IN    TEXT,
+
+            FOREIGN KEY (POSTS) REFERENCES posts (ID)
+        )
+        """,
+        """
+        INSERT INTO rounds_new
+            SELECT NUM, STATE, MOVIE, POSTS, PERCENT, ATTEMPTS, CREATED_IN,
+                   ENDED_IN
+            FROM rounds
+        """,
+        'DROP TABLE rounds',
+        'ALTER TABLE rounds_new RENAME TO rounds',
+        # Checking the foreign key when a post is deleted needs it.
+        'CREATE INDEX rounds_posts ON rounds (POSTS)',
+    ),
+    # 3: Every guess of every round, for per-player stats.
+    (
+        """
+        CREATE TABLE guesses (
+            ID          INTEGER PRIMARY KEY,
+            ROUND       INTEGER NOT NULL,
+            AUTHOR      TEXT,
+            URI         TEXT,
+            CID         TEXT,
+            TEXT        TEXT,
+            SCORE       INTEGER,
+            CORRECT     INTEGER,
+            COUNTED     INTEGER,
+            CREATED_IN  TEXT,
+
+            FOREIGN KEY (ROUND) REFERENCES rounds (NUM) ON DELETE CASCADE
+        )
+        """,
+        'CREATE INDEX guesses_round ON guesses (ROUND)',
+        'CREATE INDEX guesses_author ON guesses (AUTHOR)',
+    ),
+    # 4: The movie of a round that wasn't posted yet, see `PendingRounds`.
+    (
+        """
+        CREATE TABLE pending_round (
+            ID          INTEGER PRIMARY KEY CHECK (ID = 1),
+            MOVIE_ID    INTEGER,
+            TITLE       TEXT,
+            ALIASES     TEXT,
+            BACKDROPS   TEXT,
+            SEED        TEXT,
+            CREATED_IN  TEXT
+        )
+        """,
+    ),
+)
+
+
+def schema_version(con: Connection) -> int:
+    return con.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(con: Connection, logger: Logger) -> int:
+    """
+    Runs every migration the database doesn't have yet. Foreign keys must
+    be disabled while it runs, tables are rebuilt. Returns the version of
+    the database afterwards.
+    """
+
+    version = schema_version(con)
+    if version >= len(MIGRATIONS):
+        return version
+
+    for target, statements in enumerate(MIGRATIONS[version:], version + 1):
+        logger.info(f'Migrating database to version {target}')
+
+        con.execute('BEGIN')
+        try:
+            for statement in statements:
+                con.execute(statement)
+
+            # Pragmas don't take parameters.
+            con.execute(f'PRAGMA user_version = {target:d}')
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+
+    violations = con.execute('PRAGMA foreign_key_check').fetchall()
+    if violations:
+        logger.warning(
+                f'Database has {len(violations)} rows with broken foreign '
+                f'keys'
+        )
+
+    return schema_version(con)
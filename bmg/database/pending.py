@@ -0,0 +1,69 @@
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from sqlite3 import Connection, Cursor
+from typing import Union
+
+
+@dataclass
+class PendingRoundModel:
+    movie_id: int
+    title: str
+    aliases: Union[list[str], None]
+    backdrops: list[dict]
+    """ Backdrops picked for the round, as they come from TMDB. """
+    seed: str
+    created_in: str
+
+
+class PendingRounds:
+    """
+    The movie of the round that is about to be posted. It's kept until the
+    round post goes out, so a retry or a restart posts the same movie, with
+    the same images, instead of drawing a new one. There's never more than
+    one.
+    """
+
+    def __init__(self, con: Connection, cursor: Cursor):
+        self.con = con
+        self.cursor = cursor
+
+    def save(
+            self,
+            movie_id: int,
+            title: str,
+            aliases: Union[list[str], None],
+            backdrops: list[dict],
+            seed: str
+    ):
+        now = datetime.now().isoformat()
+
+        query = """
+        INSERT OR REPLACE INTO pending_round
+            (ID, MOVIE_ID, TITLE, ALIASES, BACKDROPS, SEED, CREATED_IN)
+            VALUES (1, ?, ?, ?, ?, ?, ?)
+        """
+
+        self.cursor.execute(
+                query,
+                (movie_id, title, json.dumps(aliases), json.dumps(backdrops),
+                 seed, now)
+        )
+        self.con.commit()
+
+    def get(self) -> Union[PendingRoundModel, None]:
+        self.cursor.execute(
+                'SELECT MOVIE_ID, TITLE, ALIASES, BACKDROPS, SEED, CREATED_IN '
+                'FROM pending_round WHERE ID=1'
+        )
+        data = self.cursor.fetchone()
+        if data is None:
+            return None
+
+        movie_id, title, aliases, backdrops, seed, created_in = data
+        return PendingRoundModel(movie_id, title, json.loads(aliases),
+                                 json.loads(backdrops), seed, created_in)
+
+    def clear(self):
+        self.cursor.execute('DELETE FROM pending_round')
+        self.con.commit()
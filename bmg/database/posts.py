@@ -18,20 +18,6 @@ class Posts:
         self.con = con
         self.cursor = cursor
 
-        self._create_table()
-
-    def _create_table(self):
-        query = """
-        CREATE TABLE IF NOT EXISTS posts (
-            ROUND_URI   TEXT,
-            ERROR_URI   TEXT,
-            END_URI     TEXT,
-            RESULTS_URI TEXT
-        )
-        """
-
-        self.cursor.execute(query)
-
     def create(self, round_uri: PostUri):
         query = 'INSERT INTO posts (ROUND_URI) VALUES (?)'
         self.cursor.execute(query, (round_uri,))
@@ -40,19 +26,19 @@ class Posts:
 
     def get_by_rowid(self, rowid: int):
         query = ('SELECT ROUND_URI, ERROR_URI, END_URI, RESULTS_URI FROM posts '
-                 'WHERE rowid=?')
+                 'WHERE ID=?')
         self.cursor.execute(query, (rowid,))
         data = self.cursor.fetchone()
-        return PostsModel(rowid, *data)
+        return PostsModel(rowid, *data) if data else None
 
     def update_error_uri(self, rowid: int, error_uri: PostUri):
-        query = 'UPDATE posts SET ERROR_URI=? WHERE rowid=?'
+        query = 'UPDATE posts SET ERROR_URI=? WHERE ID=?'
         self.cursor.execute(query, (error_uri, rowid))
 
     def update_end_uri(self, rowid: int, end_uri: PostUri):
-        query = 'UPDATE posts SET END_URI=? WHERE rowid=?'
+        query = 'UPDATE posts SET END_URI=? WHERE ID=?'
         self.cursor.execute(query, (end_uri, rowid))
 
     def update_results_uri(self, rowid: int, results_uri: PostUri):
-        query = 'UPDATE posts SET RESULTS_URI=? WHERE rowid=?'
+        query = 'UPDATE posts SET RESULTS_URI=? WHERE ID=?'
         self.cursor.execute(query, (results_uri, rowid))
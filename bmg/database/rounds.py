@@ -23,26 +23,6 @@ class Rounds:
         self.con = con
         self.cursor = cursor
 
-        self._create_table()
-
-    def _create_table(self):
-        query = """
-        CREATE TABLE IF NOT EXISTS rounds (
-            NUM         INTEGER PRIMARY KEY,
-            STATE       INTEGER,
-            MOVIE       TEXT,
-            POSTS       INTEGER,
-            PERCENT     INTEGER,
-            ATTEMPTS    INTEGER,
-            CREATED_IN  TEXT,
-            ENDED_IN    TEXT,
-            
-            FOREIGN KEY (POSTS) REFERENCES posts (rowid)
-        )
-        """
-
-        self.cursor.execute(query)
-
     def create(self, num: int, state: int, movie: str, posts_rowid: int):
         now = datetime.now().isoformat()
 
@@ -63,12 +43,13 @@ class Rounds:
                  'CREATED_IN, ENDED_IN FROM rounds WHERE rowid=?')
         self.cursor.execute(query, (rowid,))
         data = self.cursor.fetchone()
-        return RoundModel(rowid, *data)
+        return RoundModel(rowid, *data) if data else None
 
     def last_round(self):
+        # NUM is the rowid, so this is a single seek to the end of the table.
         self.cursor.execute(
                 'SELECT rowid, NUM, STATE, MOVIE, POSTS, PERCENT, ATTEMPTS, '
-                'CREATED_IN, ENDED_IN FROM rounds ORDER BY NUM DESC'
+                'CREATED_IN, ENDED_IN FROM rounds ORDER BY NUM DESC LIMIT 1'
         )
         data = self.cursor.fetchone()
         return RoundModel(*data) if data else None
@@ -2,5 +2,7 @@ from collections import namedtuple
 
 GameConfig = namedtuple(
         'GameConfig',
-        ('bsky', 'tmdb', 'imgp', 'db', 'logger', 'threshold', 'skip_on_input')
+        ('bsky', 'tmdb', 'imgp', 'db', 'logger', 'threshold', 'skip_on_input',
+         'prefetch', 'attempt_policy', 'jetstream_url'),
+        defaults=(0, 'all', None)
 )
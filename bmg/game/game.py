@@ -1,7 +1,8 @@
-from datetime import datetime
+from datetime import date, datetime
 from logging import Logger
+from threading import Thread
 from time import sleep
-from typing import Union
+from typing import Iterator, Union
 
 from bmg.bsky import BskyClient
 from bmg.database import Database
@@ -12,6 +13,9 @@ from bmg.tmdb import Movie, TmdbClient, TmdbMovieUtils
 from bmg.types import GameState
 from .config import GameConfig
 from .posts import GamePostUris, GamePosts
+from .listener import ReplyListener
+from .prefetcher import MoviePrefetcher
+from .scoring import Guess, GuessScorer, GuessTally
 
 
 class Game:
@@ -32,15 +36,37 @@ class Game:
         self.state: int = GameState.STOPPED
         self.round_number = self.last_round.num if self.last_round else 0
         self.threshold: int = config.threshold
+        self.attempt_policy: str = config.attempt_policy
 
         self.movie: Union[Movie, None] = None
+        # Selected for a round that wasn't posted yet, and kept in the
+        # database as well, see `select_random_movie`.
+        self.pending_movie: Union[Movie, None] = None
         self.posts = GamePostUris(None, None, None, None)
 
         self.attempts = 0
         self.correct_attempts = 0
         self.percent = -1
 
-    def select_random_movie(self):
+        # Every scored reply of the round, and the ones counted as attempts.
+        self.guesses: list[Guess] = []
+        self.counted_guesses: list[Guess] = []
+
+        self.liker: Union[Thread, None] = None
+
+        self.listener: Union[ReplyListener, None] = None
+        if config.jetstream_url:
+            self.listener = ReplyListener(config.jetstream_url, self.logger)
+
+        self.prefetcher: Union[MoviePrefetcher, None] = None
+        if config.prefetch:
+            self.prefetcher = MoviePrefetcher(
+                    self.prepare_random_movie,
+                    config.prefetch,
+                    self.logger
+            )
+
+    def find_random_movie(self) -> tuple[Movie, list[bytes]]:
         movie: Union[Movie, None] = None  # self.tmdb.get_random_movie()
         backdrops: Union[list[bytes], None] = None  #
 
@@ -49,46 +75,162 @@ class Game:
             movie = self.tmdb.get_random_movie()
             backdrops = TmdbMovieUtils.get_n_movie_backdrops(
                     self.tmdb,
-                    movie.id
+                    movie
+            )
+
+        self.tmdb.complete_movie(movie)
+
+        return movie, backdrops
+
+    def prepare_random_movie(self) -> Movie:
+        """
+        Picks a random movie with enough backdrops and prepares its images.
+        """
+
+        if self.tmdb.async_candidates:
+            movie, backdrops = TmdbMovieUtils.get_random_movie_with_backdrops(
+                    self.tmdb
+            )
+        else:
+            movie, backdrops = self.find_random_movie()
+
+        movie.seed = f'{movie.id}:{date.today().isoformat()}'
+        self.prepare_images(movie, backdrops)
+        return movie
+
+    def prepare_images(self, movie: Movie, backdrops: list[bytes]):
+        """
+        Prepares the images of `movie` with its seed. The same backdrops
+        prepared with the same seed look exactly the same, and come
+        straight from the blob cache.
+        """
+
+        censor_mode = self.imgp.pick_censor_mode(movie.seed)
+        movie.images = [self.imgp.prepare(i, censor_mode, movie.seed)
+                        for i in backdrops]
+
+        self.logger.info(
+                f'Prepared movie: {movie.title} (censor mode: {censor_mode})'
+        )
+
+    def load_pending_movie(self) -> Union[Movie, None]:
+        """
+        Prepares the movie of the round that was about to be posted when
+        the bot stopped, if there's one. Its backdrops and prepared images
+        are read from the blob cache when it has them.
+        """
+
+        pending = self.db.pending.get()
+        if pending is None:
+            return None
+
+        movie = Movie(
+                pending.movie_id,
+                pending.title,
+                Match.clean(pending.title),
+                None,
+                pending.aliases,
+                pending.backdrops,
+                pending.seed
+        )
+
+        try:
+            backdrops = TmdbMovieUtils.download_backdrops(
+                    self.tmdb,
+                    movie.backdrops
+            )
+            self.prepare_images(movie, backdrops)
+        except Exception as err:
+            self.logger.error(
+                    f'Could not prepare the pending movie {movie.title}, '
+                    f'selecting another one',
+                    exc_info=err
             )
+            self.db.pending.clear()
+            return None
 
-        movie.images = [self.imgp.prepare(i) for i in backdrops]
+        return movie
+
+    def select_random_movie(self):
+        """
+        Selects the movie of the round. The one of a round that was never
+        posted, because it failed or the bot stopped, is used again, so its
+        images don't have to be downloaded and prepared again. A new movie
+        is only drawn when there's none.
+        """
+
+        movie = self.pending_movie or self.load_pending_movie()
+
+        if movie is None:
+            if self.prefetcher:
+                movie = self.prefetcher.pop()
+            else:
+                movie = self.prepare_random_movie()
+
+            self.db.pending.save(
+                    movie.id,
+                    movie.title,
+                    movie.aliases,
+                    movie.backdrops,
+                    movie.seed
+            )
+        else:
+            self.logger.info('Using the movie of the round never posted')
 
         self.logger.info(f'Selected movie: {movie.title}')
+        self.pending_movie = movie
         self.movie = movie
 
-    def get_reply_score(self, reply: str):
-        reply = Match.clean(reply)
-        score = Match.str(self.movie.cleaned_title, reply)
-        return score
+    def create_scorer(self) -> GuessScorer:
+        return GuessScorer(
+                self.movie.aliases or [self.movie.cleaned_title],
+                self.threshold,
+                self.attempt_policy
+        )
 
     def calculate_correctness_percentage(self):
         self.attempts = 0
         self.correct_attempts = 0
 
-        thread_res = self.bsky.get_thread(self.posts.round)
-        thread = thread_res.thread
+        start = datetime.now()
 
-        if not len(thread.replies):
-            self.logger.info("No players participated in this round. Skipping")
-            return False
+        tally = self.listener.stop() if self.listener is not None else None
+
+        if tally and self.listener.reliable:
+            # Every reply was scored while the round was running.
+            replies = list(tally.guesses.values())
+            self.logger.info(f'Counting {len(replies)} comments')
+            guesses = tally.counted()
+        else:
+            if self.listener is not None:
+                self.logger.warning(
+                        'Reply listener got no replies or may have lost some, '
+                        'reading the thread instead'
+                )
 
-        self.logger.info(f'Matching {len(thread.replies)} comments')
-        start = datetime.now()
+            replies = [Guess.from_post(post)
+                       for post in self.bsky.iter_replies(self.posts.round)]
+            self.logger.info(f'Matching {len(replies)} comments')
+            guesses = self.create_scorer().score(replies)
 
-        for reply in thread.replies:
-            score = self.get_reply_score(reply.post.record.text)
+        self.guesses = replies
+        self.counted_guesses = guesses
 
-            if score >= self.threshold:
-                self.correct_attempts += 1
-                self.bsky.client.like(reply.post.uri, reply.post.cid)
+        if not guesses:
+            self.logger.info("No players participated in this round. Skipping")
+            return False
 
-            self.attempts += 1
+        correct = [(guess.uri, guess.cid)
+                   for guess in guesses if guess.correct]
+        self.correct_attempts = len(correct)
+        self.attempts = len(guesses)
 
         end = datetime.now()
 
         self.logger.info(f'Thread matching ended. Timing result: {end - start}')
 
+        self.like_guesses(correct)
+
         self.percent = round(self.correct_attempts / self.attempts * 100)
 
         self.logger.info(
@@ -96,6 +238,42 @@ class Game:
                 f'{self.correct_attempts}/{self.attempts} = {self.percent}%'
         )
 
+    def guess_rows(self) -> Iterator[tuple]:
+        """ Rows of the guesses table for every reply of the round. """
+
+        counted = {guess.uri for guess in self.counted_guesses}
+
+        for guess in self.guesses:
+            yield (
+                self.round_number,
+                guess.author,
+                guess.uri,
+                guess.cid,
+                guess.cleaned,
+                guess.score,
+                guess.correct,
+                guess.uri in counted,
+                guess.created_in
+            )
+
+    def like_guesses(self, posts: list[tuple[str, str]]):
+        """
+        Likes the correct guesses in the background, so the results of the
+        round don't wait for them.
+        """
+
+        # The likes of the previous round had a whole round to finish.
+        if self.liker is not None:
+            self.liker.join()
+
+        self.liker = Thread(
+                target=self.bsky.like_many,
+                args=(posts,),
+                name='liker',
+                daemon=True
+        )
+        self.liker.start()
+
     def delete_end_post(self):
         self.bsky.delete_post(self.posts.end)
         self.posts.end = None
@@ -122,6 +300,15 @@ class Game:
 
         self.logger.info("Round sent to Bsky")
 
+        self.pending_movie = None
+        self.db.pending.clear()
+
+        if self.listener is not None:
+            self.listener.watch(
+                    self.posts.round,
+                    GuessTally(self.create_scorer())
+            )
+
         db_posts_rowid: int = self.db.posts.create(self.posts.round)
         db_round_rowid: int = self.db.rounds.create(
                 self.round_number,
@@ -153,6 +340,7 @@ class Game:
         self.db.rounds.update_state(db_round_rowid, self.state)
         self.db.rounds.update_percent(db_round_rowid, self.percent)
         self.db.rounds.update_attempts(db_round_rowid, self.attempts)
+        self.db.guesses.create_many(self.guess_rows())
         self.db.commit()
 
         self.state = GameState.RESULTS
@@ -180,11 +368,12 @@ class Game:
     def check_for_last_rounds(self):
         """
         Checks if there are any unfinished rounds. If so, deletes the posts
-        and warns the users.
+        and warns the users. Finished rounds are kept, along with their
+        guesses, which are deleted with the round.
         """
 
         last_round = self.db.rounds.last_round()
-        if last_round is None:
+        if last_round is None or last_round.state == GameState.RESULTS:
             return
 
         posts = self.db.posts.get_by_rowid(last_round.posts)
@@ -204,6 +393,9 @@ class Game:
 
         self.check_for_last_rounds()
 
+        if self.prefetcher:
+            self.prefetcher.start()
+
         while True:
             try:
                 self.new_round()
@@ -213,9 +405,20 @@ class Game:
                         exc_info=err,
                         stack_info=True
                 )
-                self.bsky.post(GamePosts.critical())
-
-                if self.posts.round:
-                    self.bsky.delete_post(self.posts.round)
+                if self.listener is not None:
+                    self.listener.stop()
+
+                # Failing to report the failure must not stop the game, the
+                # next round is still worth trying.
+                try:
+                    self.bsky.post(GamePosts.critical())
+
+                    if self.posts.round:
+                        self.bsky.delete_post(self.posts.round)
+                except Exception as report_err:
+                    self.logger.error(
+                            'Could not report the exception on Bsky',
+                            exc_info=report_err
+                    )
 
                 self.wait(15)
@@ -0,0 +1,189 @@
+import asyncio
+import json
+import re
+from logging import Logger
+from threading import Event, Thread
+from time import time
+from typing import Union
+from urllib.parse import urlencode
+
+import websockets
+
+from .scoring import Guess, GuessTally
+
+POST_COLLECTION = 'app.bsky.feed.post'
+
+# Reconnections resume this far behind the last received event, so nothing
+# sent while the connection was down is missed.
+RECONNECT_REWIND_US = 5_000_000
+
+# Finds the time of an event without parsing the whole message.
+TIME_US_PATTERN = re.compile(r'"time_us":\s*(\d+)')
+
+
+class ReplyListener:
+    """
+    Follows a Jetstream websocket feed during a round and scores every
+    reply to the round post as soon as it's created, instead of pulling
+    the whole thread once the round is over.
+
+    Jetstream sends every new post of the network, so replies are filtered
+    here. Deleted replies are removed from the tally.
+    """
+
+    def __init__(
+            self,
+            url: str,
+            logger: Logger,
+            reconnect_delay: float = 5
+    ):
+        self.url = url
+        self.logger = logger
+        self.reconnect_delay = reconnect_delay
+
+        self.round_uri: Union[str, None] = None
+        self.tally: Union[GuessTally, None] = None
+        self.last_time_us = 0
+        # Whether the listener connected at all during the round, and
+        # whether it hit an error that may have cost replies.
+        self.connected = False
+        self.failed = False
+
+        self.stopped = Event()
+        self.thread: Union[Thread, None] = None
+
+    def watch(self, round_uri: str, tally: GuessTally) -> None:
+        """ Starts collecting the replies of a round into `tally`. """
+
+        self.stop()
+
+        self.round_uri = round_uri
+        self.tally = tally
+        # The round post was created just before, its first replies can't
+        # be older than that.
+        self.last_time_us = int(time() * 1_000_000)
+        self.connected = False
+        self.failed = False
+
+        self.stopped.clear()
+        self.thread = Thread(
+                target=asyncio.run,
+                args=(self._run(),),
+                name='bmg-listener',
+                daemon=True
+        )
+        self.thread.start()
+
+    def stop(self) -> Union[GuessTally, None]:
+        """ Stops collecting replies and returns the tally of the round. """
+
+        if self.thread is None:
+            return None
+
+        self.stopped.set()
+        self.thread.join()
+        self.thread = None
+
+        self.logger.info(
+                f'Stopped listening to round replies. Collected '
+                f'{len(self.tally)} replies'
+        )
+        return self.tally
+
+    @property
+    def reliable(self) -> bool:
+        """ Whether the tally can be trusted to have every reply. """
+
+        return self.connected and not self.failed
+
+    def _subscribe_url(self) -> str:
+        params = urlencode({
+            'wantedCollections': POST_COLLECTION,
+            'cursor':            self.last_time_us - RECONNECT_REWIND_US
+        })
+        return f'{self.url}?{params}'
+
+    async def _run(self):
+        while not self.stopped.is_set():
+            try:
+                async with websockets.connect(self._subscribe_url()) as ws:
+                    self.connected = True
+                    self.logger.info(
+                            f'Listening to round replies on {self.url}'
+                    )
+                    await self._receive(ws)
+            except (OSError, websockets.WebSocketException) as err:
+                # The cursor picks up where the connection was lost.
+                self.logger.warning(
+                        f'Reply listener disconnected ({err}). Reconnecting '
+                        f'in {self.reconnect_delay} seconds'
+                )
+            except Exception as err:
+                self.failed = True
+                self.logger.error(
+                        f'Reply listener failed. Reconnecting in '
+                        f'{self.reconnect_delay} seconds',
+                        exc_info=err
+                )
+            else:
+                continue
+
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _receive(self, ws):
+        while not self.stopped.is_set():
+            try:
+                message = await asyncio.wait_for(ws.recv(), 1)
+            except asyncio.TimeoutError:
+                continue
+
+            try:
+                self.handle(message)
+            except (KeyError, TypeError, ValueError) as err:
+                self.logger.debug(f'Ignored malformed Jetstream event: {err}')
+
+    def handle(self, message: Union[str, bytes]) -> None:
+        """ Adds or removes the guess of a single Jetstream event. """
+
+        if isinstance(message, bytes):
+            message = message.decode()
+
+        # Most events are posts that have nothing to do with the round, they
+        # are dropped without being parsed.
+        is_reply = self.round_uri in message
+        if not is_reply and '"delete"' not in message:
+            match = TIME_US_PATTERN.search(message)
+            if match is not None:
+                self.last_time_us = int(match.group(1))
+            return
+
+        event = json.loads(message)
+        self.last_time_us = int(event.get('time_us') or self.last_time_us)
+        commit = event.get('commit')
+        if event.get('kind') != 'commit' or commit is None or \
+                commit.get('collection') != POST_COLLECTION:
+            return
+
+        uri = f'at://{event["did"]}/{POST_COLLECTION}/{commit["rkey"]}'
+
+        if commit['operation'] == 'delete':
+            self.tally.remove(uri)
+            return
+
+        if commit['operation'] != 'create' or not is_reply:
+            return
+
+        record = commit['record']
+        parent = (record.get('reply') or {}).get('parent') or {}
+
+        # Only direct replies are guesses, same as the thread harvester.
+        if parent.get('uri') != self.round_uri:
+            return
+
+        self.tally.add(Guess(
+                event['did'],
+                uri,
+                commit['cid'],
+                record.get('text', ''),
+                record.get('createdAt', '')
+        ))
@@ -0,0 +1,86 @@
+from logging import Logger
+from queue import Empty, Queue
+from threading import Event, Thread
+from typing import Callable
+
+from bmg.tmdb import Movie
+
+
+class MoviePrefetcher:
+    """
+    Keeps a small queue of movies with their images already prepared, so
+    that a round doesn't need to wait for TMDB and image processing when it
+    starts. The queue is filled by a background thread, which mostly works
+    while the game is waiting between rounds.
+    """
+
+    def __init__(
+            self,
+            prepare: Callable[[], Movie],
+            size: int,
+            logger: Logger,
+            retry_delay: float = 30,
+            pop_timeout: float = 60
+    ):
+        self.prepare = prepare
+        self.logger = logger
+        self.retry_delay = retry_delay
+        self.pop_timeout = pop_timeout
+
+        self.queue: Queue[Movie] = Queue(maxsize=size)
+        self.stopped = Event()
+        self.thread = Thread(
+                target=self._run,
+                name='bmg-prefetcher',
+                daemon=True
+        )
+
+    def _run(self):
+        while not self.stopped.is_set():
+            try:
+                movie = self.prepare()
+            except Exception as err:
+                self.logger.error(
+                        f'Prefetcher failed preparing a movie. Retrying in '
+                        f'{self.retry_delay} seconds.',
+                        exc_info=err
+                )
+                self.stopped.wait(self.retry_delay)
+                continue
+
+            # Blocks while the queue is full, that's what keeps the thread
+            # idle until a round pops a movie.
+            self.queue.put(movie)
+            self.logger.info(
+                    f'Prefetched movie: {movie.title} '
+                    f'({self.queue.qsize()}/{self.queue.maxsize} ready)'
+            )
+
+    def start(self):
+        self.thread.start()
+        self.logger.info(
+                f'Prefetcher started, keeping {self.queue.maxsize} movies '
+                f'ready'
+        )
+
+    def stop(self):
+        self.stopped.set()
+
+    def pop(self) -> Movie:
+        """
+        Returns the next ready movie, waiting up to `pop_timeout` seconds for
+        one. After that, the movie is prepared right here, so a background
+        thread that keeps failing raises in the game instead of blocking it.
+        """
+
+        if self.queue.empty():
+            self.logger.warning('No prefetched movie ready, waiting for one')
+
+        try:
+            return self.queue.get(timeout=self.pop_timeout)
+        except Empty:
+            self.logger.warning(
+                    f'No movie prefetched in {self.pop_timeout} seconds, '
+                    f'preparing one now'
+            )
+            return self.prepare()
@@ -0,0 +1,158 @@
+from dataclasses import dataclass
+
+from bmg.matcher import Match
+
+
+class AttemptPolicy:
+    """ Which replies of the same author count as attempts. """
+
+    ALL: str = 'all'
+    FIRST: str = 'first'
+    BEST: str = 'best'
+    LAST: str = 'last'
+
+    ALL_POLICIES = (ALL, FIRST, BEST, LAST)
+
+
+@dataclass
+class Guess:
+    author: str
+    """ DID of the reply author. """
+    uri: str
+    cid: str
+    text: str
+    created_in: str
+    cleaned: str = ''
+    """ Text after `Match.clean`, set when the guess is scored. """
+    score: int = 0
+    correct: bool = False
+
+    @classmethod
+    def from_post(cls, post) -> 'Guess':
+        """ Creates a guess out of a reply post view. """
+
+        return cls(
+                post.author.did,
+                post.uri,
+                post.cid,
+                post.record.text,
+                post.record.created_at
+        )
+
+
+class GuessScorer:
+    """
+    Scores the replies of a round. Replies that are the same guess after
+    cleaning are only matched once, and the attempt policy decides which
+    replies of each author count, so that spamming guesses doesn't inflate
+    the attempts of a round.
+    """
+
+    def __init__(
+            self,
+            aliases: list[str],
+            threshold: int,
+            policy: str = AttemptPolicy.ALL
+    ):
+        if policy not in AttemptPolicy.ALL_POLICIES:
+            raise ValueError(
+                    f'Unknown attempt policy "{policy}". Expected one of: '
+                    f'{", ".join(AttemptPolicy.ALL_POLICIES)}'
+            )
+
+        self.aliases = aliases
+        self.threshold = threshold
+        self.policy = policy
+
+    def score(self, guesses: list[Guess]) -> list[Guess]:
+        """
+        Scores every guess, and returns the ones that count as attempts
+        according to the policy, in chronological order.
+
+        Scores are exact, even under the threshold, since every guess is
+        stored and the best attempt policy compares them.
+        """
+
+        for guess in guesses:
+            guess.cleaned = Match.clean(guess.text)
+
+        scores = Match.batch(
+                self.aliases,
+                [guess.cleaned for guess in guesses],
+                cleaned=True
+        )
+
+        for guess, score in zip(guesses, scores):
+            self._apply(guess, score)
+
+        return self.count(guesses)
+
+    def score_one(self, guess: Guess) -> Guess:
+        """
+        Scores a single guess, as it arrives. A single row isn't worth the
+        worker threads, that only `score` uses.
+        """
+
+        guess.cleaned = Match.clean(guess.text)
+        score = Match.batch(
+                self.aliases,
+                [guess.cleaned],
+                workers=1,
+                cleaned=True
+        )[0]
+        return self._apply(guess, score)
+
+    def _apply(self, guess: Guess, score: int) -> Guess:
+        guess.score = int(score)
+        guess.correct = guess.score >= self.threshold
+        return guess
+
+    def count(self, guesses: list[Guess]) -> list[Guess]:
+        """ Keeps only the guesses that count as attempts. """
+
+        guesses = sorted(guesses, key=lambda guess: guess.created_in)
+
+        if self.policy == AttemptPolicy.ALL:
+            return guesses
+
+        counted: dict[str, Guess] = {}
+        for guess in guesses:
+            kept = counted.get(guess.author)
+
+            if kept is None or self.policy == AttemptPolicy.LAST or \
+                    (self.policy == AttemptPolicy.BEST and
+                     guess.score > kept.score):
+                counted[guess.author] = guess
+
+        return sorted(counted.values(), key=lambda guess: guess.created_in)
+
+
+class GuessTally:
+    """
+    Running tally of a round whose replies arrive one by one. Every guess is
+    scored when it arrives, so the results are ready as soon as the round
+    ends.
+    """
+
+    def __init__(self, scorer: GuessScorer):
+        self.scorer = scorer
+        self.guesses: dict[str, Guess] = {}
+
+    def add(self, guess: Guess) -> None:
+        if guess.uri in self.guesses:
+            return
+
+        self.guesses[guess.uri] = self.scorer.score_one(guess)
+
+    def remove(self, uri: str) -> None:
+        """ Forgets a guess whose reply was deleted. """
+
+        self.guesses.pop(uri, None)
+
+    def __len__(self) -> int:
+        return len(self.guesses)
+
+    def counted(self) -> list[Guess]:
+        """ The guesses that count as attempts, same as `GuessScorer`. """
+
+        return self.scorer.count(list(self.guesses.values()))
@@ -8,5 +8,7 @@
     Author: João Iacillo <john@iacillo.dev.br>
 """
 
+from .censor import CensorMode
+from .encoder import BudgetEncoder
 from .movie_image import MovieImage
 from .preparer import ImagePreparer
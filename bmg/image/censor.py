@@ -6,28 +6,55 @@
     Author: João Iacillo <john@iacillo.dev.br>
 """
 
-from random import randint
+from random import Random, randint
+
+from PIL import Image, ImageDraw
 
 from .types import BoundingBox, ImageSize
 
 
+class CensorMode:
+    RECTS: str = 'rects'
+    """ Draws four black rectangles around the visible window. """
+    CANVAS: str = 'canvas'
+    """ Pastes the visible window onto a black canvas. """
+    PIXELATE: str = 'pixelate'
+    """ Hidden area is turned into big blocks of color. """
+    BLUR: str = 'blur'
+    """ Hidden area is blurred by scaling it down and up again. """
+
+    ALL = (RECTS, CANVAS, PIXELATE, BLUR)
+
+
+# Size, in pixels, of each block of the pixelate mode.
+PIXELATE_BLOCK = 32
+
+# How many times the image is scaled down by the blur mode.
+BLUR_FACTOR = 16
+
+
 class CensorUtils:
     @staticmethod
-    def create_visible_window(i_size: ImageSize) -> BoundingBox:
+    def create_visible_window(
+            i_size: ImageSize,
+            rng: Random = None
+    ) -> BoundingBox:
         """
         Creates a bounding box to be used as the visible window of the image.
-        It's position and size are randomly generated on each call.
+        It's position and size are randomly generated on each call, unless a
+        seeded `rng` is given.
         """
 
+        rand = rng.randint if rng is not None else randint
         i_width, i_height = i_size
 
-        x1_offset = randint(150, 501)
-        y1_offset = randint(150, 301)
+        x1_offset = rand(150, 501)
+        y1_offset = rand(150, 301)
 
         # The initial (0) coordinates cannot surpass the image's size,
         # otherwise there will be now visible area.
-        x0 = randint(0, i_width - x1_offset)
-        y0 = randint(0, i_height - y1_offset)
+        x0 = rand(0, i_width - x1_offset)
+        y0 = rand(0, i_height - y1_offset)
         x1 = min(i_width, x0 + x1_offset)
         y1 = min(i_height, y0 + y1_offset)
 
@@ -53,3 +80,56 @@ class CensorUtils:
         right_rect: BoundingBox = (x1, y0, width, y1)
 
         return [top_rect, left_rect, bottom_rect, right_rect]
+
+    @classmethod
+    def apply(
+            cls,
+            image: Image.Image,
+            mode: str = CensorMode.CANVAS,
+            rng: Random = None
+    ) -> Image.Image:
+        """
+        Censors everything outside a random visible window using `mode`.
+
+        The rects mode draws over `image` itself, the other ones build a new
+        image, so always use the returned one.
+        """
+
+        window = cls.create_visible_window(image.size, rng)
+
+        if mode == CensorMode.RECTS:
+            draw = ImageDraw.Draw(image)
+            black = (0, 0, 0)
+            for rect in cls.create_censor_rects(image.size, window):
+                draw.rectangle(rect, fill=black)
+            return image
+
+        if mode == CensorMode.CANVAS:
+            hidden = Image.new(image.mode, image.size)
+        elif mode == CensorMode.PIXELATE:
+            hidden = cls._downscale(image, PIXELATE_BLOCK).resize(
+                    image.size,
+                    Image.Resampling.NEAREST
+            )
+        elif mode == CensorMode.BLUR:
+            hidden = cls._downscale(image, BLUR_FACTOR).resize(
+                    image.size,
+                    Image.Resampling.BILINEAR
+            )
+        else:
+            raise ValueError(
+                    f'Unknown censor mode "{mode}". Expected one of: '
+                    f'{", ".join(CensorMode.ALL)}'
+            )
+
+        hidden.paste(image.crop(window), window[:2])
+        return hidden
+
+    @staticmethod
+    def _downscale(image: Image.Image, factor: int) -> Image.Image:
+        width, height = image.size
+        # reduce() averages each block of pixels, and it's a lot cheaper than
+        # resizing with a filter.
+        return image.reduce(
+                (max(1, min(factor, width)), max(1, min(factor, height)))
+        )
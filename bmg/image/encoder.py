@@ -0,0 +1,114 @@
+""" encoder.py
+
+    Bsky rejects image blobs bigger than its size limit, and the bigger the
+    blob, the longer the upload. This encoder searches for the highest
+    quality that still lands under a byte budget.
+
+    Author: João Iacillo <john@iacillo.dev.br>
+"""
+
+from io import BytesIO
+from time import perf_counter
+
+from PIL import Image
+
+from .types import EncodeResult
+
+# Bsky's PDS refuses image blobs bigger than 1,000,000 bytes. The budget
+# keeps a margin under it, so a limit counted a bit differently by another
+# PDS doesn't fail the upload of a round.
+BSKY_BLOB_MAX_BYTES = 1_000_000
+BSKY_BLOB_SAFETY_MARGIN = 20_000
+BSKY_IMAGE_MAX_BYTES = BSKY_BLOB_MAX_BYTES - BSKY_BLOB_SAFETY_MARGIN
+
+ENCODER_FORMATS = ('JPEG', 'WEBP')
+
+
+class BudgetEncoder:
+    def __init__(
+            self,
+            budget: int = BSKY_IMAGE_MAX_BYTES,
+            i_format: str = 'JPEG',
+            max_quality: int = 90,
+            min_quality: int = 30
+    ):
+        i_format = i_format.upper()
+        if i_format not in ENCODER_FORMATS:
+            raise ValueError(
+                    f'Unsupported encoder format "{i_format}". Expected one '
+                    f'of: {", ".join(ENCODER_FORMATS)}'
+            )
+
+        self.budget = budget
+        self.format = i_format
+        self.max_quality = max_quality
+        self.min_quality = min(min_quality, max_quality)
+
+    def _encode(self, image: Image.Image, quality: int) -> bytes:
+        output = BytesIO()
+
+        if self.format == 'JPEG':
+            image.save(output, format='JPEG', quality=quality, optimize=True)
+        else:
+            image.save(output, format='WEBP', quality=quality, method=4)
+
+        return output.getvalue()
+
+    def encode(self, image: Image.Image) -> EncodeResult:
+        """
+        Encodes the image with the highest quality that fits the budget.
+
+        The maximum quality is tried first, so images that already fit are
+        encoded only once. Otherwise, the quality is binary searched down to
+        the minimum quality. If even that doesn't fit, the image is scaled
+        down until it does.
+        """
+
+        start = perf_counter()
+        attempts = 0
+
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+
+        while True:
+            data = self._encode(image, self.max_quality)
+            attempts += 1
+            quality = self.max_quality
+
+            if len(data) > self.budget:
+                best, best_quality = None, None
+                low, high = self.min_quality, self.max_quality - 1
+
+                while low <= high:
+                    mid = (low + high) // 2
+                    candidate = self._encode(image, mid)
+                    attempts += 1
+
+                    if len(candidate) <= self.budget:
+                        best, best_quality = candidate, mid
+                        low = mid + 1
+                    else:
+                        high = mid - 1
+
+                if best is None:
+                    width, height = image.size
+                    if width <= 1 or height <= 1:
+                        raise ValueError(
+                                f'Image can\'t fit in {self.budget} bytes'
+                        )
+                    image = image.resize(
+                            (max(1, width * 3 // 4), max(1, height * 3 // 4)),
+                            Image.Resampling.BILINEAR
+                    )
+                    continue
+
+                data, quality = best, best_quality
+
+            return EncodeResult(
+                    data,
+                    self.format,
+                    quality,
+                    len(data),
+                    perf_counter() - start,
+                    attempts
+            )
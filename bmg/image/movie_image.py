@@ -7,67 +7,107 @@
     Author: João Iacillo <john@iacillo.dev.br>
 """
 
-from PIL import Image, ImageDraw
+from io import BytesIO
+from random import Random
+from time import perf_counter
+from typing import Union
 
+from PIL import Image
+
+from bmg.consts import IMAGE_MAX_SIZE
 from .buffer import Buffer
-from .censor import CensorUtils
-from .tmdb import TMDB_SVG
+from .censor import CensorMode, CensorUtils
+from .encoder import BudgetEncoder
+from .tmdb import get_watermark
+from .types import EncodeResult, StageTimings
 
 
 class MovieImage:
     def __init__(self, i_bytes: bytes):
         self.buffer = Buffer(i_bytes)
+        self.encoded: Union[EncodeResult, None] = None
+
+    @staticmethod
+    def _draft(image: Image.Image) -> None:
+        # JPEGs can be decoded at 1/2, 1/4 or 1/8 of their size for free.
+        # Draft picks the smallest scale that still covers the output size,
+        # so the pixels we would throw away are never decoded. It must be
+        # called before the image data is loaded, and it's a no-op for other
+        # formats.
+        image.draft('RGB', IMAGE_MAX_SIZE)
+
+    @staticmethod
+    def _resize(image: Image.Image) -> None:
+        # Images bigger than 1280x720 should always be avoided.
+        if image.size[0] > IMAGE_MAX_SIZE[0] or \
+                image.size[1] > IMAGE_MAX_SIZE[1]:
+            image.thumbnail(IMAGE_MAX_SIZE, Image.Resampling.BILINEAR)
+
+    @staticmethod
+    def _paste_watermark(image: Image.Image) -> None:
+        img_width, img_height = image.size
+        mark = get_watermark(img_width)
+        mark_height = mark.size[1]
+        mark_offset = 50
+
+        watermark_pos = (mark_offset, img_height - mark_height - mark_offset)
+
+        # The watermark is its own mask, so the transparency is applied
+        # without needing an alpha channel on the target image.
+        image.paste(mark, watermark_pos, mark)
 
     def optimize(self, quality: int) -> None:
         """ Resizes, compress, and optimize an image into a JPG `BytesIO` """
 
         image, output = self.buffer.create_pair()
 
-        # Images bigger than 1280x720 should always be avoided.
-        if image.size[0] > 1280 or image.size[1] > 720:
-            image.thumbnail((1280, 720), Image.Resampling.BILINEAR)
+        self._draft(image)
+        self._resize(image)
 
         image.save(output, format='JPEG', quality=quality, optimize=True)
 
         self.buffer.save(output)
 
-    def censor(self) -> None:
+    def censor(
+            self,
+            mode: str = CensorMode.CANVAS,
+            rng: Random = None
+    ) -> None:
         """
         Important part of the game. The image needs to have certain parts
-        censored so that the challenge can rise up. This draws rectangles
+        censored so that the challenge can rise up. This hides everything
         around a random generated rectangle area, so that only it can be
-        visible.
+        visible. See `CensorMode` for the ways it can be hidden.
         """
 
         image, output = self.buffer.create_pair()
 
-        visible_rect = CensorUtils.create_visible_window(image.size)
-        censor_rects = CensorUtils.create_censor_rects(image.size, visible_rect)
-
-        draw = ImageDraw.Draw(image)
-        black = (0, 0, 0)
-        for rect in censor_rects:
-            draw.rectangle(rect, fill=black)
+        image = CensorUtils.apply(image, mode, rng)
 
         image.save(output, format='JPEG')
         self.buffer.save(output)
 
-    def watermark(self) -> None:
+    def watermark(self, encoder: BudgetEncoder = None) -> None:
         """
         TMDB is a free and open API. This function includes their logo for
         properly attributing it as the source. Please do NOT deactive this.
+
+        When an `encoder` is given, the result is encoded by it instead of
+        being saved as PNG.
         """
 
         image, output = self.buffer.create_pair()
-        image = image.convert('RGBA')
 
-        img_height = image.size[1]
-        mark_height = TMDB_SVG.size[1]
-        mark_offset = 50
+        if encoder is not None:
+            image = image.convert('RGB')
+            self._paste_watermark(image)
+            self.encoded = encoder.encode(image)
+            self.buffer = Buffer(self.encoded.data)
+            return
 
-        watermark_pos = (mark_offset, img_height - mark_height - mark_offset)
+        image = image.convert('RGBA')
 
-        image.paste(TMDB_SVG, watermark_pos, TMDB_SVG)
+        self._paste_watermark(image)
 
         # Always saving as JPEG only to save as PNG at the end, yeah I know...
         # But that's for optimization reasons. Adding the watermark involves
@@ -76,5 +116,54 @@ class MovieImage:
 
         self.buffer.save(output)
 
+    def process(
+            self,
+            quality: int,
+            encoder: BudgetEncoder = None,
+            censor_mode: str = CensorMode.CANVAS,
+            rng: Random = None
+    ) -> StageTimings:
+        """
+        Fused version of `optimize`, `censor` and `watermark`. The image is
+        decoded once, every stage works on the same in-memory image, and it
+        is encoded once as JPEG at the end, or by `encoder` if given.
+
+        Returns how long each of the stages took.
+        """
+
+        timings = StageTimings()
+
+        start = perf_counter()
+        image = Image.open(self.buffer.buffer)
+        self._draft(image)
+        image.load()
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        timings.decode = perf_counter() - start
+
+        start = perf_counter()
+        self._resize(image)
+        timings.resize = perf_counter() - start
+
+        start = perf_counter()
+        image = CensorUtils.apply(image, censor_mode, rng)
+        timings.censor = perf_counter() - start
+
+        start = perf_counter()
+        self._paste_watermark(image)
+        timings.watermark = perf_counter() - start
+
+        start = perf_counter()
+        if encoder is not None:
+            self.encoded = encoder.encode(image)
+            self.buffer = Buffer(self.encoded.data)
+        else:
+            output = BytesIO()
+            image.save(output, format='JPEG', quality=quality, optimize=True)
+            self.buffer.save(output)
+        timings.encode = perf_counter() - start
+
+        return timings
+
     def to_bytes(self) -> bytes:
         return self.buffer.to_bytes()
@@ -3,31 +3,146 @@
     Author: João Iacillo <john@iacillo.dev.br>
 """
 
+from hashlib import sha256
 from logging import Logger
+from random import Random, choice
+from time import perf_counter
+from typing import Union
 
+from bmg.blobcache import BlobCache
+from bmg.consts import IMAGE_MAX_SIZE
 from bmg.image import MovieImage
+from .censor import CensorMode
+from .encoder import BudgetEncoder
+from .tmdb import WATERMARK_BASE_SIZE, WATERMARK_OUTPUT_WIDTHS, watermark_hash
 
 
 class ImagePreparer:
-    def __init__(self, quality: int, logger: Logger):
+    def __init__(
+            self,
+            quality: int,
+            logger: Logger,
+            fused: bool = True,
+            encoder: BudgetEncoder = None,
+            censor_modes: tuple[str, ...] = (CensorMode.CANVAS,),
+            cache: BlobCache = None
+    ):
         self.quality = quality
         self.logger = logger
+        self.fused = fused
+        self.encoder = encoder
+        self.censor_modes = censor_modes
+        self.cache = cache
 
         logger.info(f'ImagePrepare using JPEG quality of {quality}')
+        if fused:
+            logger.info('ImagePrepare using the fused pipeline')
+        if encoder:
+            logger.info(
+                    f'ImagePrepare encoding {encoder.format} under '
+                    f'{encoder.budget} bytes'
+            )
+        logger.info(f'ImagePrepare censor modes: {", ".join(censor_modes)}')
 
-    def prepare(self, image_bytes: bytes) -> bytes:
+    def pick_censor_mode(self, seed: Union[str, None] = None) -> str:
+        """
+        Randomly picks one of the censor modes for a round. The same `seed`
+        always picks the same mode.
+        """
+
+        if seed is not None:
+            return Random(seed).choice(self.censor_modes)
+        return choice(self.censor_modes)
+
+    def _cache_key(
+            self,
+            original_hash: str,
+            censor_mode: str,
+            seed: str
+    ) -> str:
+        encoder = self.encoder
+        return BlobCache.key(
+                'prepared',
+                original=original_hash,
+                quality=self.quality,
+                fused=self.fused,
+                size=IMAGE_MAX_SIZE,
+                encoder=encoder and (encoder.budget, encoder.format,
+                                     encoder.max_quality, encoder.min_quality),
+                censor_mode=censor_mode,
+                seed=seed,
+                # A new watermark must not serve images with the old one.
+                watermark=(watermark_hash(), WATERMARK_OUTPUT_WIDTHS,
+                           WATERMARK_BASE_SIZE)
+        )
+
+    def prepare(
+            self,
+            image_bytes: bytes,
+            censor_mode: str = None,
+            seed: str = None
+    ) -> bytes:
         """
         Optimizes, censors and watermarks an image bytes objects automatically.
 
         This is pretty much a shortcut for doing these repetitive function
         calls for every image obtained from the API.
 
-        You provide bytes, you receive bytes.
+        You provide bytes, you receive bytes. The censor mode defaults to the
+        first one of `censor_modes`.
+
+        With a `seed`, the censored window is always the same for the same
+        image, and the result is kept in the blob cache, if there is one.
         """
 
+        if censor_mode is None:
+            censor_mode = self.censor_modes[0]
+
+        key = None
+        rng = None
+
+        if seed is not None:
+            # Each image of a round needs its own window, so the round seed
+            # is combined with the image content.
+            original_hash = sha256(image_bytes).hexdigest()
+            rng = Random(f'{seed}:{original_hash}')
+
+            if self.cache is not None:
+                key = self._cache_key(original_hash, censor_mode, seed)
+                cached = self.cache.get(key)
+                if cached is not None:
+                    self.logger.debug('Prepared image read from blob cache')
+                    return cached
+
         image = MovieImage(image_bytes)
-        image.optimize(self.quality)
-        image.censor()
-        image.watermark()
+
+        if self.fused:
+            timings = image.process(
+                    self.quality,
+                    self.encoder,
+                    censor_mode,
+                    rng
+            )
+            self.logger.debug(f'Image prepared ({censor_mode}): {timings}')
+        else:
+            image.optimize(self.quality)
+            start = perf_counter()
+            image.censor(censor_mode, rng)
+            self.logger.debug(
+                    f'Image censored ({censor_mode}) in '
+                    f'{(perf_counter() - start) * 1000:.1f}ms'
+            )
+            image.watermark(self.encoder)
+
+        if image.encoded:
+            self.logger.debug(
+                    f'Image encoded as {image.encoded.format} with quality '
+                    f'{image.encoded.quality}: {image.encoded.size} bytes in '
+                    f'{image.encoded.time * 1000:.1f}ms '
+                    f'({image.encoded.attempts} attempts)'
+            )
+
+        if key is not None:
+            self.cache.put(key, image.to_bytes())
 
         return image.to_bytes()
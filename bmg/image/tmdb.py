@@ -3,23 +3,135 @@
     Author: João Iacillo <john@iacillo.dev.br>
 """
 
+from functools import lru_cache
+from hashlib import sha256
 from io import BytesIO
-from os import path
+from os import makedirs, path, replace
+from tempfile import NamedTemporaryFile
 
 from PIL import Image as PILImage
-from cairosvg import svg2png
 
-from bmg.consts import ROOT_DIR
+from bmg.consts import IMAGE_MAX_SIZE, ROOT_DIR
 
 # TMDB Attribution SVG for watermarking. Please, ONLY CHANGE THIS if you're
 # moving the file to another location or changing it's name, otherwise, keep
 # this here for properly attributing the API as the source.
 TMDB_SVG_PATH = path.join(ROOT_DIR, "tmdb.svg")
 
-# We preserve the original file format for authenticity. This conversion only
-# occurs during bootup, so it won't affect the bmg performance at all.
-with open(TMDB_SVG_PATH, 'rb') as svg:
-    svg_data = svg.read()
+# Rasterized watermarks are kept in here, so cairo is only needed to build
+# them. See `build_watermarks.py`.
+WATERMARK_CACHE_DIR = path.join(ROOT_DIR, '.cache', 'watermark')
+
+# Output widths that get their own pre-scaled watermark. The watermark is
+# 100px wide on a 1280px wide image, and keeps that proportion on the others.
+WATERMARK_OUTPUT_WIDTHS = (IMAGE_MAX_SIZE[0], 960, 640)
+WATERMARK_BASE_SIZE = 100
+
+
+def _watermark_box(output_width: int) -> int:
+    return round(WATERMARK_BASE_SIZE * output_width / IMAGE_MAX_SIZE[0])
+
+
+def _rasterize(svg_data: bytes, box: int) -> PILImage.Image:
+    # We preserve the original file format for authenticity. Cairo is only
+    # imported when a watermark isn't cached, so it isn't needed at runtime.
+    from cairosvg import svg2png
+
     png_data = svg2png(bytestring=svg_data)
-    TMDB_SVG = PILImage.open(BytesIO(png_data)).convert('RGBA')
-    TMDB_SVG.thumbnail((100, 100), PILImage.Resampling.BILINEAR)
+    image = PILImage.open(BytesIO(png_data)).convert('RGBA')
+    image.thumbnail((box, box), PILImage.Resampling.BILINEAR)
+    return image
+
+
+def _save_atomically(image: PILImage.Image, file: str) -> None:
+    with NamedTemporaryFile(
+            dir=path.dirname(file),
+            suffix='.tmp',
+            delete=False
+    ) as tmp:
+        image.save(tmp, format='PNG')
+    replace(tmp.name, file)
+
+
+def read_svg() -> bytes:
+    with open(TMDB_SVG_PATH, 'rb') as svg:
+        return svg.read()
+
+
+@lru_cache(maxsize=None)
+def watermark_hash() -> str:
+    """ Content hash of the SVG, it names the rasterized files. """
+
+    return sha256(read_svg()).hexdigest()[:16]
+
+
+def _watermark_file(output_width: int) -> str:
+    box = _watermark_box(output_width)
+    return path.join(
+            WATERMARK_CACHE_DIR,
+            f'tmdb-{watermark_hash()}-{box}.png'
+    )
+
+
+def build_watermark_cache() -> list[str]:
+    """
+    Rasterizes one watermark for each of `WATERMARK_OUTPUT_WIDTHS` into
+    `WATERMARK_CACHE_DIR`, skipping the ones already there. This is the only
+    place that writes the cache and needs cairo, it runs once at build time
+    through `build_watermarks.py`. Returns the files.
+    """
+
+    svg_data = read_svg()
+    makedirs(WATERMARK_CACHE_DIR, exist_ok=True)
+
+    files = []
+    for output_width in WATERMARK_OUTPUT_WIDTHS:
+        file = _watermark_file(output_width)
+        if not path.exists(file):
+            image = _rasterize(svg_data, _watermark_box(output_width))
+            _save_atomically(image, file)
+
+        files.append(file)
+
+    return files
+
+
+@lru_cache(maxsize=None)
+def load_watermarks() -> dict[int, PILImage.Image]:
+    """
+    Loads the cached watermarks on first use. A missing file, like when the
+    SVG changed and the cache wasn't rebuilt, is rasterized in memory only,
+    so the cache directory can be read-only.
+    """
+
+    watermarks = {}
+    svg_data = None
+
+    for output_width in WATERMARK_OUTPUT_WIDTHS:
+        file = _watermark_file(output_width)
+
+        if path.exists(file):
+            image = PILImage.open(file)
+            image.load()
+        else:
+            if svg_data is None:
+                svg_data = read_svg()
+            image = _rasterize(svg_data, _watermark_box(output_width))
+
+        watermarks[output_width] = image.convert('RGBA')
+
+    return watermarks
+
+
+def get_watermark(image_width: int) -> PILImage.Image:
+    """
+    Returns the pre-scaled watermark made for the biggest output width that
+    fits in `image_width`.
+    """
+
+    watermarks = load_watermarks()
+    for output_width in WATERMARK_OUTPUT_WIDTHS:
+        if output_width <= image_width:
+            return watermarks[output_width]
+
+    return watermarks[WATERMARK_OUTPUT_WIDTHS[-1]]
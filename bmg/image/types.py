@@ -3,7 +3,48 @@
     Author: João Iacillo <john@iacillo.dev.br>
 """
 
+from dataclasses import dataclass
+
 ImageSize = tuple[int, int]
 
 BoundingBox = tuple[int, int, int, int]
 """ The rectangular area defined by the top-left and bottom-right points. """
+
+
+@dataclass
+class StageTimings:
+    """ Time, in seconds, that each preparation stage took for one image. """
+
+    decode: float = 0.0
+    resize: float = 0.0
+    censor: float = 0.0
+    watermark: float = 0.0
+    encode: float = 0.0
+
+    @property
+    def total(self) -> float:
+        return (self.decode + self.resize + self.censor + self.watermark +
+                self.encode)
+
+    def __str__(self) -> str:
+        return (f'decode={self.decode * 1000:.1f}ms '
+                f'resize={self.resize * 1000:.1f}ms '
+                f'censor={self.censor * 1000:.1f}ms '
+                f'watermark={self.watermark * 1000:.1f}ms '
+                f'encode={self.encode * 1000:.1f}ms '
+                f'total={self.total * 1000:.1f}ms')
+
+
+@dataclass
+class EncodeResult:
+    """ Output of a `BudgetEncoder` run. """
+
+    data: bytes
+    format: str
+    quality: int
+    size: int
+    """ Final size of `data`, in bytes. """
+    time: float
+    """ Time, in seconds, that the whole search took. """
+    attempts: int
+    """ How many times the image was encoded until it fit the budget. """
@@ -14,20 +14,67 @@
     Author: João Iacillo <john@iacillo.dev.br>
 """
 
+from functools import lru_cache
+from typing import Union
+from unicodedata import combining, normalize
+
+import numpy as np
 from fuzzywuzzy import fuzz
+from rapidfuzz import fuzz as rfuzz, process
+
+# How many cleaned strings are remembered. Titles and popular guesses repeat
+# a lot between replies.
+CLEAN_CACHE_SIZE = 65536
+
+
+class _CleanTable(dict):
+    """
+    `str.translate` table that drops symbols and accents and turns every
+    kind of whitespace into a plain space. The Latin-1 range is computed up
+    front, the other characters are computed once, on their first use.
+    """
+
+    def __init__(self):
+        super().__init__()
+        for code in range(256):
+            self[code] = self.__missing__(code)
+
+    def __missing__(self, code: int):
+        char = chr(code)
+
+        if char.isspace():
+            value = ' '
+        elif char.isalnum() and not combining(char):
+            value = char
+        else:
+            # Symbols, and the accents that NFKD splits from their letters.
+            value = None
+
+        self[code] = value
+        return value
+
+
+_CLEAN_TABLE = _CleanTable()
+
+
+@lru_cache(maxsize=CLEAN_CACHE_SIZE)
+def _clean(string: str) -> str:
+    if not string.isascii():
+        string = normalize('NFKD', string)
+
+    return ' '.join(string.casefold().translate(_CLEAN_TABLE).split())
+
 
 class Match:
     @staticmethod
     def clean(string: str) -> str:
         """
-        Cleans a string before their matching.
+        Cleans a string before their matching: accents are removed ("Amélie"
+        becomes "amelie"), symbols are dropped, the case is folded and the
+        whitespace is collapsed.
         """
 
-        cleaned = string.strip()
-        cleaned = ''.join(c for c in cleaned if c.isalnum() or c.isspace())
-        cleaned = cleaned.lower().split()
-
-        return ' '.join(cleaned)
+        return _clean(string)
 
     @staticmethod
     def str(a: str, b: str) -> int:
@@ -41,3 +88,83 @@ class Match:
         """
 
         return fuzz.ratio(a, b)
+
+    @classmethod
+    def aliases(cls, titles: list[str]) -> list[str]:
+        """
+        Creates every cleaned variant of the titles that should still count
+        as a right guess: the title before a subtitle (after ":" or " - "),
+        "&" written as "and", and the title without its leading article.
+        """
+
+        aliases = set()
+
+        for title in titles:
+            raw = {
+                title,
+                title.split(':')[0],
+                title.split(' - ')[0],
+                title.replace('&', 'and'),
+            }
+
+            for variant in raw:
+                cleaned = cls.clean(variant)
+                aliases.add(cleaned)
+
+                for article in ('the ', 'a ', 'an '):
+                    if cleaned.startswith(article):
+                        aliases.add(cleaned[len(article):])
+
+        # Single letters would match way too many guesses.
+        return sorted(alias for alias in aliases if len(alias) > 1)
+
+    @classmethod
+    def batch(
+            cls,
+            titles: Union[str, list[str]],
+            replies: list[str],
+            threshold: int = 0,
+            workers: int = -1,
+            cleaned: bool = False
+    ) -> np.ndarray:
+        """
+        Cleans every reply and scores all of them against already cleaned
+        titles in a single matrix call, using every CPU core by default. Each
+        reply keeps its best score among all titles, so it's meant for a
+        title and its aliases.
+
+        Returns one score per reply, in the same order, rounded the same way
+        as `str`. Scores under `threshold` are returned as 0, since there's
+        no point in computing them exactly. Replies that are the same after
+        cleaning are only scored once. Pass `cleaned` when the replies went
+        through `clean` already.
+        """
+
+        if isinstance(titles, str):
+            titles = [titles]
+
+        # Lots of replies are the exact same guess. Each distinct one is
+        # scored once, and the scores are fanned back out to the replies.
+        if not cleaned:
+            replies = [cls.clean(reply) for reply in replies]
+
+        distinct: dict[str, int] = {}
+        positions = np.fromiter(
+                (distinct.setdefault(reply, len(distinct))
+                 for reply in replies),
+                dtype=np.intp,
+                count=len(replies)
+        )
+
+        # `str` rounds the scores, so 79.5 already counts as 80.
+        cutoff = max(0.0, threshold - 0.5)
+
+        scores = process.cdist(
+                titles,
+                list(distinct),
+                scorer=rfuzz.ratio,
+                score_cutoff=cutoff,
+                workers=workers
+        ).max(axis=0, initial=0)
+
+        return np.rint(scores).astype(np.uint8)[positions]
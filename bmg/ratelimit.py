@@ -0,0 +1,243 @@
+""" ratelimit.py
+
+    Every write the bot makes to its PDS costs points from an hourly budget
+    (creating a record costs 3, updating 2 and deleting 1). Running out of
+    points fails the write with a 429, which used to cost a whole round.
+
+    `WriteScheduler` is the single way out for Bluesky calls. It keeps a
+    token bucket in sync with the ratelimit-* headers the PDS sends back,
+    serves waiting calls by priority, so the posts of a round go before the
+    likes, and waits for the limit to reset when a call is rate limited.
+
+    Author: João Iacillo <john@iacillo.dev.br>
+"""
+
+import heapq
+from itertools import count
+from logging import Logger
+from threading import Condition
+from time import monotonic, sleep, time
+from typing import Callable, TypeVar, Union
+
+from atproto.exceptions import RequestErrorBase
+from atproto_client.request import Request, Response
+
+T = TypeVar('T')
+
+# Default PDS write limit: 5000 points per hour.
+WRITE_POINTS = 5000
+WRITE_WINDOW = 60 * 60
+
+# Only these endpoints spend write points. The headers of any other call
+# belong to other limits and would desync the bucket.
+WRITE_NSIDS = (
+    'com.atproto.repo.applyWrites',
+    'com.atproto.repo.createRecord',
+    'com.atproto.repo.deleteRecord',
+    'com.atproto.repo.putRecord',
+)
+
+
+def _lower_keys(headers: dict) -> dict:
+    return {key.lower(): value for key, value in headers.items()}
+
+
+def _policy_window(policy: str, limit: str) -> Union[int, None]:
+    """
+    Window in seconds of the ratelimit-policy entry, like "5000;w=3600",
+    whose quota is `limit`. A header may list many policies.
+    """
+
+    for entry in policy.split(','):
+        quota, *params = entry.split(';')
+        if quota.strip() != limit:
+            continue
+
+        for param in params:
+            name, _, value = param.strip().partition('=')
+            if name == 'w' and value.isnumeric() and int(value) > 0:
+                return int(value)
+
+    return None
+
+
+class WriteCost:
+    READ: int = 0
+    DELETE: int = 1
+    UPDATE: int = 2
+    CREATE: int = 3
+
+
+class WritePriority:
+    """ Lower values are served first. """
+
+    POST: int = 0
+    LIKE: int = 1
+
+
+class WriteScheduler:
+    def __init__(
+            self,
+            logger: Logger,
+            points: int = WRITE_POINTS,
+            window: float = WRITE_WINDOW,
+            retries: int = 3
+    ):
+        self.logger = logger
+        self.capacity = points
+        self.window = window
+        self.retries = retries
+
+        self.tokens = float(points)
+        self.updated = monotonic()
+        # Wall clock time until which nothing is sent, after a 429.
+        self.blocked_until = 0.0
+
+        self.condition = Condition()
+        self.waiting: list[tuple[int, int]] = []
+        self.tickets = count()
+
+    def _refill(self):
+        now = monotonic()
+        rate = self.capacity / self.window
+        self.tokens = min(
+                self.capacity,
+                self.tokens + (now - self.updated) * rate
+        )
+        self.updated = now
+
+    def _wait_time(self, cost: int) -> float:
+        blocked = self.blocked_until - time()
+        missing = min(cost, self.capacity) - self.tokens
+        return max(blocked, missing * self.window / self.capacity, 0)
+
+    def acquire(self, cost: int, priority: int) -> None:
+        """
+        Waits until `cost` points are available and no call with a higher
+        priority is waiting for them, then spends them.
+        """
+
+        with self.condition:
+            ticket = (priority, next(self.tickets))
+            heapq.heappush(self.waiting, ticket)
+
+            try:
+                while True:
+                    self._refill()
+                    wait = None
+
+                    if self.waiting[0] == ticket:
+                        wait = self._wait_time(cost)
+                        if wait <= 0:
+                            self.tokens -= cost
+                            return
+
+                    self.condition.wait(wait)
+            finally:
+                self.waiting.remove(ticket)
+                heapq.heapify(self.waiting)
+                self.condition.notify_all()
+
+    def update(self, headers: dict) -> None:
+        """ Syncs the bucket with the ratelimit-* headers of a response. """
+
+        headers = _lower_keys(headers)
+        limit = headers.get('ratelimit-limit', '')
+        remaining = headers.get('ratelimit-remaining', '')
+        reset = headers.get('ratelimit-reset', '')
+
+        if not limit.isnumeric() or not remaining.isnumeric():
+            return
+
+        window = _policy_window(headers.get('ratelimit-policy', ''), limit)
+
+        with self.condition:
+            self._refill()
+
+            # The limit alone says nothing about how fast it refills, so
+            # the bucket is only resized along with its policy's window.
+            if window is not None:
+                self.capacity = int(limit)
+                self.window = window
+
+            self.tokens = min(self.tokens, float(remaining))
+
+            if int(remaining) == 0 and reset.isnumeric():
+                self.blocked_until = max(self.blocked_until, float(reset))
+
+            self.condition.notify_all()
+
+    def _backoff(self, response: Response, attempt: int, cost: int) -> float:
+        reset = _lower_keys(response.headers).get('ratelimit-reset', '')
+        delay = float(reset) - time() if reset.isnumeric() else \
+            60 * 2 ** attempt
+        delay = min(max(delay, 1), self.window)
+
+        # Reads have their own limits, they only wait by themselves.
+        if cost > 0:
+            with self.condition:
+                self.blocked_until = max(self.blocked_until, time() + delay)
+                self.tokens = min(self.tokens, 0)
+                self.condition.notify_all()
+
+        return delay
+
+    def run(
+            self,
+            call: Callable[..., T],
+            *args,
+            cost: int = WriteCost.CREATE,
+            priority: int = WritePriority.POST,
+            **kwargs
+    ) -> T:
+        """
+        Runs `call` once its points are available. Rate limited calls are
+        retried after the limit resets, any other error is raised.
+        """
+
+        for attempt in range(self.retries + 1):
+            self.acquire(cost, priority)
+
+            try:
+                return call(*args, **kwargs)
+            except RequestErrorBase as err:
+                response = err.response
+                if response is None or response.status_code != 429 or \
+                        attempt == self.retries:
+                    raise
+
+                delay = self._backoff(response, attempt, cost)
+                self.logger.warning(
+                        f'Rate limited by Bsky. Retrying in {delay:.0f}s'
+                )
+
+                if cost == 0:
+                    sleep(delay)
+
+
+class ObservedRequest(Request):
+    """
+    atproto request that hands the headers of every write to a callback,
+    including the ones of failed writes.
+    """
+
+    def __init__(self, observe: Callable[[dict], None] = None):
+        super().__init__()
+        self.observe = observe
+
+    def _observe(self, url: str, headers: dict):
+        if self.observe is not None and url.endswith(WRITE_NSIDS):
+            self.observe(headers)
+
+    def post(self, *args, **kwargs) -> Response:
+        url = kwargs.get('url') or args[0]
+
+        try:
+            response = super().post(*args, **kwargs)
+        except RequestErrorBase as err:
+            if err.response is not None:
+                self._observe(url, err.response.headers)
+            raise
+
+        self._observe(url, response.headers)
+        return response
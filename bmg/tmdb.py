@@ -7,13 +7,37 @@
     Author: João Iacillo <john@iacillo.dev.br>
 """
 
+import asyncio
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
 from dataclasses import dataclass
 from random import choice, randint, sample
-from typing import Union
+from threading import Lock, Thread
+from typing import Awaitable, Callable, TypeVar, Union
 
 from requests import get
 
+from bmg.backdrops import BackdropIndex
+from bmg.blobcache import BlobCache
+from bmg.catalog import MovieCatalog
+from bmg.consts import IMAGE_MAX_SIZE
 from bmg.matcher import Match
+from bmg.transport import HttpTransport
+
+# Movies with fewer backdrops than this can't be used in a round.
+MIN_BACKDROPS = 4
+
+# The English title, alternative titles and translations of a movie, all in
+# a single request.
+MOVIE_DETAILS_PARAMS = {
+    'language':           'en-US',
+    'append_to_response': 'alternative_titles,translations'
+}
+
+T = TypeVar('T')
+
+# Widths that TMDB renders backdrops at, from the smallest to the biggest.
+# Anything bigger than the last tier is only available as "original".
+BACKDROP_SIZES = (300, 780, 1280)
 
 
 @dataclass
@@ -22,32 +46,78 @@ class Movie:
     title: str
     cleaned_title: str
     images: Union[list[bytes], None]
+    aliases: Union[list[str], None] = None
+    """ Cleaned titles that also count as right, see `Match.aliases`. """
+    backdrops: Union[list[dict], None] = None
+    """ The backdrops `images` were downloaded from, in the same order. """
+    seed: Union[str, None] = None
+    """ Seed `images` were prepared with, see `ImagePreparer.prepare`. """
 
 
-class TmdbClient:
-    def __init__(self, access_token: str):
-        self.access_token = access_token
+class TmdbApi:
+    """
+    Requests and responses of the TMDB API, plus the catalog, backdrop index
+    and blob cache lookups around them. Both the sync and the async client
+    are built on these, so they only differ in how requests are sent.
+    """
 
-    def request(self, url: str, params: dict = None):
-        if params is None:
-            params = {}
+    API_URL = 'https://api.themoviedb.org/3'
+    IMAGE_URL = 'https://image.tmdb.org/t/p'
 
-        headers = {
-            'Authorization': 'Bearer ' + self.access_token
-        }
+    @staticmethod
+    def headers(access_token: str) -> dict:
+        return {'Authorization': 'Bearer ' + access_token}
+
+    @staticmethod
+    def catalog_movie(
+            catalog: Union[MovieCatalog, None]
+    ) -> Union[Movie, None]:
+        """
+        Picks a random movie from the local catalog, if there's one. Those
+        movies come with their original title, the English one comes with
+        the movie details.
+        """
 
-        return get(url, params, headers=headers)
+        if catalog is None:
+            return None
 
-    def get_random_movie(self) -> Movie:
-        page = randint(1, 1000) // 20
-        url = f'https://api.themoviedb.org/3/discover/movie'
+        picked = catalog.random_movie()
+        if picked is None:
+            return None
+
+        movie_id, original_title = picked
+        return Movie(
+                movie_id,
+                original_title,
+                Match.clean(original_title),
+                None
+        )
+
+    @classmethod
+    def discover_request(cls) -> tuple[str, dict]:
+        """ A random page among the 50 first of the most popular movies. """
+
+        url = f'{cls.API_URL}/discover/movie'
         params = {
             'include_adult': 'false',
             'sort_by':       'popularity.desc',
-            'page':          page
+            'page':          randint(1, 50)
         }
-        response = self.request(url, params)
-        results = response.json()['results']
+        return url, params
+
+    @staticmethod
+    def pick_discovered(
+            results: list[dict],
+            backdrop_index: Union[BackdropIndex, None]
+    ) -> Movie:
+        # Skipping the movies we already know can't be used, unless it's all
+        # of them.
+        if backdrop_index is not None:
+            results = [
+                result for result in results
+                if not backdrop_index.has_too_few(result['id'], MIN_BACKDROPS)
+            ] or results
+
         chosen = choice(results)
 
         return Movie(
@@ -57,52 +127,393 @@ class TmdbClient:
                 None
         )
 
-    def get_movie_name(self, movie_id: int) -> str:
-        url = f' https://api.themoviedb.org/3/movie/{movie_id}'
-        response = self.request(url, {'language': 'en-US'})
-        return response.json()['title']
+    @classmethod
+    def details_request(cls, movie_id: int) -> tuple[str, dict]:
+        return f'{cls.API_URL}/movie/{movie_id}', MOVIE_DETAILS_PARAMS
+
+    @classmethod
+    def images_url(cls, movie_id: int) -> str:
+        return f'{cls.API_URL}/movie/{movie_id}/images'
+
+    @staticmethod
+    def indexed_backdrops(
+            backdrop_index: Union[BackdropIndex, None],
+            movie_id: int
+    ) -> Union[list[dict], None]:
+        if backdrop_index is None:
+            return None
+        return backdrop_index.get(movie_id)
+
+    @staticmethod
+    def index_backdrops(
+            backdrop_index: Union[BackdropIndex, None],
+            movie_id: int,
+            images: dict
+    ) -> list[dict]:
+        """
+        Takes the backdrops out of a movie images response, indexing them
+        when there's a backdrop index.
+        """
+
+        backdrops = images['backdrops']
+        if backdrop_index is not None:
+            backdrop_index.put(movie_id, backdrops)
+        return backdrops
+
+    @classmethod
+    def image_url(cls, file_path: str, size: str = 'original') -> str:
+        return f'{cls.IMAGE_URL}/{size}/{file_path}'
+
+    @staticmethod
+    def image_key(file_path: str, size: str) -> str:
+        return BlobCache.key('original', file_path=file_path, size=size)
+
+
+class TmdbClient:
+    def __init__(
+            self,
+            access_token: str,
+            download_workers: int = 4,
+            download_timeout: float = 30,
+            catalog: MovieCatalog = None,
+            backdrop_index: BackdropIndex = None,
+            transport: HttpTransport = None,
+            async_candidates: int = 0,
+            blob_cache: BlobCache = None
+    ):
+        self.access_token = access_token
+        self.download_workers = download_workers
+        self.download_timeout = download_timeout
+        self.catalog = catalog
+        self.backdrop_index = backdrop_index
+        self.transport = transport or HttpTransport(
+                pool_size=max(10, download_workers)
+        )
+        self.async_candidates = async_candidates
+        self.blob_cache = blob_cache
+
+        # The async client and its event loop live as long as this client,
+        # so their connections are reused from one round to the next.
+        self.async_lock = Lock()
+        self.async_client = None
+        self.async_loop: Union[asyncio.AbstractEventLoop, None] = None
+
+    def request(self, url: str, params: dict = None):
+        if params is None:
+            params = {}
+
+        headers = TmdbApi.headers(self.access_token)
+
+        return self.transport.get(url, params, headers, revalidate=True)
+
+    def _start_async(self):
+        from bmg.tmdb_async import AsyncTmdbClient
+
+        self.async_loop = asyncio.new_event_loop()
+        Thread(
+                target=self.async_loop.run_forever,
+                name='bmg-tmdb-async',
+                daemon=True
+        ).start()
+
+        async_client = AsyncTmdbClient(
+                self.access_token,
+                concurrency=max(8, self.download_workers),
+                connect_timeout=self.transport.timeout[0],
+                read_timeout=self.transport.timeout[1],
+                download_timeout=self.download_timeout,
+                retries=self.transport.retries,
+                catalog=self.catalog,
+                backdrop_index=self.backdrop_index,
+                blob_cache=self.blob_cache
+        )
+        asyncio.run_coroutine_threadsafe(
+                async_client.__aenter__(),
+                self.async_loop
+        ).result()
+        self.async_client = async_client
+
+    def run_async(self, work: Callable[..., Awaitable[T]]) -> T:
+        """
+        Runs `work(async_client)` on the long-lived async client, sharing
+        the settings, catalog, backdrop index and blob cache of this one.
+        Can be called from any thread.
+        """
+
+        with self.async_lock:
+            if self.async_client is None:
+                self._start_async()
+
+        return asyncio.run_coroutine_threadsafe(
+                work(self.async_client),
+                self.async_loop
+        ).result()
+
+    def get_random_movie(self) -> Movie:
+        """
+        Picks a random movie from the local catalog when there is one. Those
+        movies come with their original title, use `complete_movie` for
+        getting the English one.
+
+        Otherwise, picks from the 50 first pages of the most popular movies.
+        """
+
+        movie = TmdbApi.catalog_movie(self.catalog)
+        if movie is not None:
+            return movie
+
+        response = self.request(*TmdbApi.discover_request())
+        return TmdbApi.pick_discovered(
+                response.json()['results'],
+                self.backdrop_index
+        )
+
+    def complete_movie(self, movie: Movie) -> None:
+        """
+        Sets the English title of the movie, and its aliases from the TMDB
+        alternative titles and translations. Only call it once the movie is
+        known to be used, since it costs a request.
+        """
+
+        response = self.request(*TmdbApi.details_request(movie.id))
+        TmdbMovieUtils.apply_details(movie, response.json())
 
     def get_movie_images(self, movie_id: int):
-        url = f'https://api.themoviedb.org/3/movie/{movie_id}/images'
-        return self.request(url)
+        return self.request(TmdbApi.images_url(movie_id))
 
     def get_movie_backdrops(self, movie_id: int):
-        images = self.get_movie_images(movie_id).json()
-        return images['backdrops']
+        """
+        Returns the backdrops of a movie from the backdrop index when it's
+        there, and only requests and indexes them otherwise.
+        """
+
+        backdrops = TmdbApi.indexed_backdrops(self.backdrop_index, movie_id)
+        if backdrops is not None:
+            return backdrops
+
+        return TmdbApi.index_backdrops(
+                self.backdrop_index,
+                movie_id,
+                self.get_movie_images(movie_id).json()
+        )
 
 
 class TmdbMovieUtils:
+    @staticmethod
+    def apply_details(movie: Movie, details: dict) -> None:
+        """
+        Fills `movie` with the result of a movie details request made with
+        `MOVIE_DETAILS_PARAMS`.
+        """
+
+        movie.title = details.get('title') or movie.title
+        movie.cleaned_title = Match.clean(movie.title)
+
+        titles = [movie.title, details.get('original_title')]
+        titles += [alternative['title'] for alternative in
+                   details.get('alternative_titles', {}).get('titles', [])]
+        titles += [translation['data'].get('title') for translation in
+                   details.get('translations', {}).get('translations', [])]
+
+        movie.aliases = Match.aliases([title for title in titles if title])
+
     @classmethod
     def get_n_movie_backdrops(
             cls,
             client: TmdbClient,
-            movie_id: int,
+            movie: Movie,
             n: int = 4
     ):
         """
-        Automatically fetches `n` random backdrops from a movie with `id`.
+        Automatically fetches `n` random backdrops from `movie`, and keeps
+        the ones picked in `movie.backdrops`.
         """
 
-        all_backdrops = client.get_movie_backdrops(movie_id)
-        if len(all_backdrops) < 4:
+        all_backdrops = client.get_movie_backdrops(movie.id)
+        if len(all_backdrops) < max(n, MIN_BACKDROPS):
             return None
-        n_backdrops = sample(all_backdrops, n)
 
-        images = [cls.get_movie_image(backdrop['file_path']) for backdrop in
-                  n_backdrops[:n]]
+        movie.backdrops = sample(all_backdrops, n)
+        return cls.download_backdrops(client, movie.backdrops)
+
+    @classmethod
+    def download_backdrops(
+            cls,
+            client: TmdbClient,
+            backdrops: list[dict]
+    ) -> list[bytes]:
+        """
+        Downloads the smallest rendition that fits each one of `backdrops`.
+        The ones that are in the client blob cache aren't downloaded again.
+        """
+
+        file_paths = [backdrop['file_path'] for backdrop in backdrops]
+        sizes = [cls.get_backdrop_size(backdrop) for backdrop in backdrops]
+
+        images: list[Union[bytes, None]] = [None] * len(backdrops)
+        keys = [None] * len(backdrops)
+
+        if client.blob_cache is not None:
+            for i, (file_path, size) in enumerate(zip(file_paths, sizes)):
+                keys[i] = TmdbApi.image_key(file_path, size)
+                images[i] = client.blob_cache.get(keys[i])
+
+        missing = [i for i, image in enumerate(images) if image is None]
+        missing_paths = [file_paths[i] for i in missing]
+        missing_sizes = [sizes[i] for i in missing]
+
+        if client.download_workers > 1:
+            downloaded = cls.get_movie_images_concurrently(
+                    missing_paths,
+                    client.download_workers,
+                    client.download_timeout,
+                    missing_sizes,
+                    client.transport
+            )
+        else:
+            downloaded = [
+                cls.get_movie_image(
+                        file_path,
+                        client.download_timeout,
+                        size,
+                        client.transport
+                )
+                for file_path, size in zip(missing_paths, missing_sizes)
+            ]
+
+        for i, image in zip(missing, downloaded):
+            images[i] = image
+            if client.blob_cache is not None:
+                client.blob_cache.put(keys[i], image)
 
         return images
 
     @staticmethod
-    def get_movie_image(file_path: str):
+    def get_random_movie_with_backdrops(
+            client: TmdbClient,
+            n: int = 4
+    ) -> tuple[Movie, list[bytes]]:
+        """
+        Sync wrapper of `AsyncTmdbMovieUtils.find_random_movie`. Looks at
+        `client.async_candidates` random movies at the same time, and returns
+        the first one with at least `n` backdrops along with `n` of them.
+        Runs on the long-lived async client of `client`, see `run_async`.
+        """
+
+        from bmg.tmdb_async import AsyncTmdbMovieUtils
+
+        return client.run_async(
+                lambda async_client: AsyncTmdbMovieUtils.find_random_movie(
+                        async_client,
+                        n,
+                        client.async_candidates
+                )
+        )
+
+    @classmethod
+    def get_movie_images_concurrently(
+            cls,
+            file_paths: list[str],
+            workers: int,
+            timeout: float = None,
+            sizes: list[str] = None,
+            transport: HttpTransport = None
+    ) -> list[bytes]:
+        """
+        Downloads every image in `file_paths` at the same time, using up to
+        `workers` parallel downloads.
+
+        The images are returned in the same order as `file_paths`. If any of
+        the downloads fails, the ones that haven't started are cancelled and
+        the error is raised right away, without waiting for the others.
+        """
+
+        if sizes is None:
+            sizes = ['original'] * len(file_paths)
+
+        executor = ThreadPoolExecutor(max_workers=workers)
+        futures = [
+            executor.submit(
+                    cls.get_movie_image,
+                    file_path,
+                    timeout,
+                    size,
+                    transport
+            )
+            for file_path, size in zip(file_paths, sizes)
+        ]
+
+        try:
+            done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+
+            for future in done:
+                if future.exception() is not None:
+                    raise future.exception()
+
+            return [future.result() for future in futures]
+        finally:
+            # Downloads still running are left behind, they'll be bounded by
+            # their own timeout anyway.
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def get_backdrop_size(
+            backdrop: dict,
+            target: tuple[int, int] = IMAGE_MAX_SIZE
+    ) -> str:
+        """
+        Picks the smallest TMDB rendition of a backdrop that is still as big
+        as the backdrop once it's fitted into `target`, based on the `width`
+        and `height` that come with it in `get_movie_backdrops`.
+
+        Returns the size name used in the image URL, like "w1280". Falls back
+        to "original" when no rendition is big enough, or when the backdrop
+        isn't bigger than the rendition anyway.
+        """
+
+        width = backdrop.get('width')
+        height = backdrop.get('height')
+        if not width or not height:
+            return 'original'
+
+        target_width, target_height = target
+
+        # The image is scaled down to fit `target` keeping its aspect ratio,
+        # so only the width it ends up with matters. Wider backdrops are
+        # bounded by the target width, taller ones by the target height.
+        fit_width = min(width, target_width, target_height * width / height)
+
+        for tier_width in BACKDROP_SIZES:
+            if tier_width >= width:
+                break
+
+            if tier_width >= fit_width:
+                return f'w{tier_width}'
+
+        return 'original'
+
+    @staticmethod
+    def get_movie_image(
+            file_path: str,
+            timeout: float = None,
+            size: str = 'original',
+            transport: HttpTransport = None
+    ):
         """
         Images obtained by `tmdb_get_movie_images` or
         `tmdb_get_movie_backdrops` contain a property called `file_path`.
         That's the one this function needs for fetching the image file from
         the API.
 
+        `size` is one of the TMDB renditions, see `get_backdrop_size`. Pass
+        the client `transport` for reusing its connections.
+
         Returns the image content as a `bytes` instance.
         """
-        url = f'https://image.tmdb.org/t/p/original/{file_path}'
-        response = get(url)
+        url = TmdbApi.image_url(file_path, size)
+        if transport is not None:
+            response = transport.get(url, timeout=timeout)
+        else:
+            response = get(url, timeout=timeout)
+        response.raise_for_status()
         return response.content
@@ -0,0 +1,355 @@
+""" tmdb_async.py
+
+    Async counterpart of the TMDB client, built on httpx. Every request goes
+    through a single concurrency limit, so discovery, image listing and
+    backdrop downloads of several candidate movies can be in flight at the
+    same time without flooding TMDB.
+
+    Most of the time, a round needs just one movie with enough backdrops.
+    `AsyncTmdbMovieUtils.find_random_movie` looks at a few candidates at once
+    and cancels the others as soon as one of them is good enough.
+
+    Requests are built and parsed by `TmdbApi`, same as the sync client. The
+    catalog, backdrop index and blob cache are blocking SQLite and disk
+    calls, so they run in worker threads, out of the event loop.
+
+    Use `TmdbMovieUtils.get_random_movie_with_backdrops` from sync code.
+
+    Author: João Iacillo <john@iacillo.dev.br>
+"""
+
+import asyncio
+from random import sample
+from typing import Union
+
+import httpx
+
+from bmg.backdrops import BackdropIndex
+from bmg.blobcache import BlobCache
+from bmg.catalog import MovieCatalog
+from bmg.tmdb import MIN_BACKDROPS, Movie, TmdbApi, TmdbMovieUtils
+from bmg.transport import RETRY_BACKOFF_FACTOR, RETRY_BACKOFF_MAX, \
+    RETRY_STATUSES, RevalidationCache
+
+
+class AsyncTmdbClient:
+    def __init__(
+            self,
+            access_token: str,
+            concurrency: int = 8,
+            connect_timeout: float = 5,
+            read_timeout: float = 15,
+            download_timeout: float = 30,
+            retries: int = 3,
+            catalog: MovieCatalog = None,
+            backdrop_index: BackdropIndex = None,
+            blob_cache: BlobCache = None
+    ):
+        self.access_token = access_token
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.download_timeout = download_timeout
+        self.retries = retries
+        self.catalog = catalog
+        self.backdrop_index = backdrop_index
+        self.blob_cache = blob_cache
+
+        self.revalidation_cache: RevalidationCache[httpx.Response] = \
+            RevalidationCache()
+
+        self.concurrency = concurrency
+        self.semaphore: Union[asyncio.Semaphore, None] = None
+        self.http: Union[httpx.AsyncClient, None] = None
+
+    async def __aenter__(self):
+        # Both are bound to the running event loop, so they're only created
+        # once inside it.
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.http = httpx.AsyncClient(
+                timeout=httpx.Timeout(
+                        self.read_timeout,
+                        connect=self.connect_timeout
+                ),
+                limits=httpx.Limits(max_connections=self.concurrency),
+                follow_redirects=True
+        )
+        return self
+
+    async def __aexit__(self, *_):
+        await self.http.aclose()
+
+    async def get(
+            self,
+            url: str,
+            params: dict = None,
+            headers: dict = None,
+            read_timeout: float = None,
+            revalidate: bool = False
+    ) -> httpx.Response:
+        """
+        Sends a GET request within the concurrency limit. Rate limits,
+        server errors, connection errors and timeouts are retried with
+        exponential backoff, honoring Retry-After, like `HttpTransport`.
+
+        With `revalidate`, the last response of the same URL is sent back
+        with If-None-Match, and reused when the server answers with 304 Not
+        Modified. Only use it for metadata, images are never revalidated.
+        """
+
+        headers = dict(headers or {})
+        timeout = httpx.Timeout(
+                read_timeout or self.read_timeout,
+                connect=self.connect_timeout
+        )
+
+        cached: Union[httpx.Response, None] = None
+        key = None
+
+        if revalidate:
+            key = str(httpx.Request('GET', url, params=params).url)
+            cached = self.revalidation_cache.if_none_match(key, headers)
+
+        for attempt in range(self.retries + 1):
+            delay = RETRY_BACKOFF_FACTOR * 2 ** attempt
+
+            try:
+                async with self.semaphore:
+                    response = await self.http.get(
+                            url,
+                            params=params,
+                            headers=headers,
+                            timeout=timeout
+                    )
+            except httpx.TransportError:
+                if attempt == self.retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or \
+                        attempt == self.retries:
+                    break
+
+                retry_after = response.headers.get('Retry-After', '')
+                if retry_after.isnumeric():
+                    delay = float(retry_after)
+
+            await asyncio.sleep(min(delay, RETRY_BACKOFF_MAX))
+
+        if revalidate:
+            return self.revalidation_cache.update(key, cached, response)
+
+        return response
+
+    async def request(self, url: str, params: dict = None) -> httpx.Response:
+        headers = TmdbApi.headers(self.access_token)
+
+        return await self.get(url, params or {}, headers, revalidate=True)
+
+    async def get_random_movie(self) -> Movie:
+        """
+        Picks a random movie from the local catalog when there is one, and
+        from the most popular movies otherwise.
+        """
+
+        movie = await asyncio.to_thread(TmdbApi.catalog_movie, self.catalog)
+        if movie is not None:
+            return movie
+
+        response = await self.request(*TmdbApi.discover_request())
+        return await asyncio.to_thread(
+                TmdbApi.pick_discovered,
+                response.json()['results'],
+                self.backdrop_index
+        )
+
+    async def complete_movie(self, movie: Movie) -> None:
+        """ Sets the English title and the aliases of the movie. """
+
+        response = await self.request(*TmdbApi.details_request(movie.id))
+        TmdbMovieUtils.apply_details(movie, response.json())
+
+    async def get_movie_images(self, movie_id: int) -> httpx.Response:
+        return await self.request(TmdbApi.images_url(movie_id))
+
+    async def get_movie_backdrops(self, movie_id: int) -> list[dict]:
+        """
+        Returns the backdrops of a movie from the backdrop index when it's
+        there, and only requests and indexes them otherwise.
+        """
+
+        backdrops = await asyncio.to_thread(
+                TmdbApi.indexed_backdrops,
+                self.backdrop_index,
+                movie_id
+        )
+        if backdrops is not None:
+            return backdrops
+
+        response = await self.get_movie_images(movie_id)
+        return await asyncio.to_thread(
+                TmdbApi.index_backdrops,
+                self.backdrop_index,
+                movie_id,
+                response.json()
+        )
+
+
+class AsyncTmdbMovieUtils:
+    @staticmethod
+    async def _first_failure_cancels(tasks: list[asyncio.Task]) -> list:
+        """
+        Waits for every task, but cancels the remaining ones and raises as
+        soon as one of them fails. Results keep the order of `tasks`.
+        """
+
+        try:
+            done, _ = await asyncio.wait(
+                    tasks,
+                    return_when=asyncio.FIRST_EXCEPTION
+            )
+
+            for task in done:
+                if task.exception() is not None:
+                    raise task.exception()
+
+            return [task.result() for task in tasks]
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    @classmethod
+    async def get_n_movie_backdrops(
+            cls,
+            client: AsyncTmdbClient,
+            movie: Movie,
+            n: int = 4
+    ) -> Union[list[bytes], None]:
+        """
+        Downloads `n` random backdrops of a movie, or returns None if it
+        doesn't have enough of them. The ones picked are kept in
+        `movie.backdrops`.
+        """
+
+        all_backdrops = await client.get_movie_backdrops(movie.id)
+        if len(all_backdrops) < max(n, MIN_BACKDROPS):
+            return None
+
+        movie.backdrops = sample(all_backdrops, n)
+        return await cls.download_backdrops(client, movie.backdrops)
+
+    @classmethod
+    async def download_backdrops(
+            cls,
+            client: AsyncTmdbClient,
+            backdrops: list[dict]
+    ) -> list[bytes]:
+        tasks = [
+            asyncio.ensure_future(cls.get_movie_image(
+                    client,
+                    backdrop['file_path'],
+                    TmdbMovieUtils.get_backdrop_size(backdrop)
+            ))
+            for backdrop in backdrops
+        ]
+
+        return await cls._first_failure_cancels(tasks)
+
+    @staticmethod
+    async def get_movie_image(
+            client: AsyncTmdbClient,
+            file_path: str,
+            size: str = 'original'
+    ) -> bytes:
+        """
+        Downloads a TMDB image rendition, going through the client blob
+        cache when there's one.
+        """
+
+        key = None
+        if client.blob_cache is not None:
+            key = TmdbApi.image_key(file_path, size)
+            cached = await asyncio.to_thread(client.blob_cache.get, key)
+            if cached is not None:
+                return cached
+
+        response = await client.get(
+                TmdbApi.image_url(file_path, size),
+                read_timeout=client.download_timeout
+        )
+        response.raise_for_status()
+
+        if key is not None:
+            await asyncio.to_thread(client.blob_cache.put, key,
+                                    response.content)
+
+        return response.content
+
+    @classmethod
+    async def _candidate(
+            cls,
+            client: AsyncTmdbClient,
+            n: int
+    ) -> Union[tuple[Movie, list[dict]], None]:
+        movie = await client.get_random_movie()
+        backdrops = await client.get_movie_backdrops(movie.id)
+
+        if len(backdrops) < max(n, MIN_BACKDROPS):
+            return None
+
+        return movie, backdrops
+
+    @classmethod
+    async def find_random_movie(
+            cls,
+            client: AsyncTmdbClient,
+            n: int = 4,
+            candidates: int = 3,
+            max_attempts: int = 10
+    ) -> tuple[Movie, list[bytes]]:
+        """
+        Looks at `candidates` random movies at the same time and keeps the
+        first one that has at least `n` backdrops, cancelling the others.
+        Its title and aliases are fetched while `n` random backdrops are
+        downloaded concurrently.
+
+        Gives up with a `LookupError` after `max_attempts` batches of
+        candidates without a single usable movie.
+        """
+
+        for _ in range(max_attempts):
+            tasks = [asyncio.ensure_future(cls._candidate(client, n))
+                     for _ in range(candidates)]
+
+            found = None
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    try:
+                        found = await next_done
+                    except httpx.HTTPError:
+                        continue
+                    if found is not None:
+                        break
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+            if found is None:
+                continue
+
+            movie, backdrops = found
+            movie.backdrops = sample(backdrops, n)
+            complete = asyncio.ensure_future(client.complete_movie(movie))
+            try:
+                images = await cls.download_backdrops(
+                        client,
+                        movie.backdrops
+                )
+                await complete
+            finally:
+                complete.cancel()
+
+            return movie, images
+
+        raise LookupError(
+                f'No movie with {n} backdrops found after {max_attempts} '
+                f'attempts'
+        )
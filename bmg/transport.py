@@ -0,0 +1,155 @@
+""" transport.py
+
+    Shared HTTP transport for every request the bot makes to TMDB. A single
+    session keeps connections alive per host, so the TLS handshake happens
+    once instead of on every call. Every request has explicit timeouts, and
+    rate limits and server errors are retried with exponential backoff.
+
+    Author: João Iacillo <john@iacillo.dev.br>
+"""
+
+from collections import OrderedDict
+from threading import Lock
+from typing import Generic, TypeVar, Union
+
+from requests import Request, Response, Session
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Responses that are worth trying again. Retry-After is honored for them.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# How many ETag revalidated responses are kept in memory.
+REVALIDATION_CACHE_SIZE = 256
+
+# Backoff between retries: 0.5s, 1s, 2s... up to 30s, same as urllib3's.
+RETRY_BACKOFF_FACTOR = 0.5
+RETRY_BACKOFF_MAX = 30
+
+R = TypeVar('R')
+
+
+class RevalidationCache(Generic[R]):
+    """
+    Last response of each URL that came with an ETag, so it can be sent
+    back with If-None-Match and reused on 304 Not Modified. The least
+    recently used ones are dropped after `size`. Used by the sync and the
+    async TMDB clients, with their own response types.
+    """
+
+    def __init__(self, size: int = REVALIDATION_CACHE_SIZE):
+        self.size = size
+        self.responses: OrderedDict[str, R] = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key: str) -> Union[R, None]:
+        with self.lock:
+            response = self.responses.get(key)
+            if response is not None:
+                self.responses.move_to_end(key)
+            return response
+
+    def if_none_match(self, key: str, headers: dict) -> Union[R, None]:
+        """
+        Adds If-None-Match to `headers` when `key` is cached, and returns
+        the cached response.
+        """
+
+        cached = self.get(key)
+        if cached is not None:
+            headers['If-None-Match'] = cached.headers['ETag']
+        return cached
+
+    def update(self, key: str, cached: Union[R, None], response: R) -> R:
+        """
+        Returns the response to use: the cached one when `response` is a
+        304, otherwise `response`, which is cached when it has an ETag.
+        """
+
+        if cached is not None and response.status_code == 304:
+            return cached
+
+        if 200 <= response.status_code < 300 and 'ETag' in response.headers:
+            with self.lock:
+                self.responses[key] = response
+                self.responses.move_to_end(key)
+                while len(self.responses) > self.size:
+                    self.responses.popitem(last=False)
+
+        return response
+
+
+class HttpTransport:
+    def __init__(
+            self,
+            connect_timeout: float = 5,
+            read_timeout: float = 15,
+            retries: int = 3,
+            pool_size: int = 10
+    ):
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+
+        retry = Retry(
+                total=retries,
+                backoff_factor=RETRY_BACKOFF_FACTOR,
+                backoff_max=RETRY_BACKOFF_MAX,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=frozenset({'GET', 'HEAD'}),
+                respect_retry_after_header=True,
+                raise_on_status=False
+        )
+        # One pool per host, big enough for the concurrent downloads.
+        adapter = HTTPAdapter(
+                pool_connections=4,
+                pool_maxsize=pool_size,
+                max_retries=retry
+        )
+
+        self.session = Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.revalidation_cache: RevalidationCache[Response] = \
+            RevalidationCache()
+
+    def get(
+            self,
+            url: str,
+            params: dict = None,
+            headers: dict = None,
+            timeout: Union[float, tuple[float, float]] = None,
+            revalidate: bool = False
+    ) -> Response:
+        """
+        Sends a GET request through the shared session.
+
+        With `revalidate`, the last response of the same URL is sent back
+        with If-None-Match, and reused when the server answers with 304 Not
+        Modified. Only use it for metadata, images are never revalidated.
+        """
+
+        headers = dict(headers or {})
+        if timeout is None:
+            timeout = self.timeout
+        elif not isinstance(timeout, tuple):
+            timeout = (self.timeout[0], timeout)
+
+        cached: Union[Response, None] = None
+        key = None
+
+        if revalidate:
+            key = Request('GET', url, params=params).prepare().url
+            cached = self.revalidation_cache.if_none_match(key, headers)
+
+        response = self.session.get(
+                url,
+                params=params,
+                headers=headers,
+                timeout=timeout
+        )
+
+        if revalidate:
+            return self.revalidation_cache.update(key, cached, response)
+
+        return response
@@ -0,0 +1,23 @@
+""" build_watermarks.py
+
+    Rasterizes the TMDB watermark into `.cache/watermark`, one PNG for each
+    output width. The bot only reads these files, so cairo is only needed
+    where this runs. The Dockerfile runs it in its build stage:
+
+        $ python3 build_watermarks.py
+
+    Run it again after changing `tmdb.svg`.
+
+    Author: João Iacillo <john@iacillo.dev.br>
+"""
+
+from bmg.image.tmdb import build_watermark_cache
+
+
+def main():
+    for file in build_watermark_cache():
+        print(file)
+
+
+if __name__ == '__main__':
+    main()
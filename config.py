@@ -10,11 +10,13 @@
     Author: João Iacillo <john@iacillo.dev.br>
 """
 
-from os import getenv as os_getenv
+from os import getenv as os_getenv, path
 from typing import Callable, Union
 
 from dotenv import load_dotenv
 
+from bmg.consts import ROOT_DIR
+
 load_dotenv()
 
 
@@ -90,6 +92,35 @@ BOT_SKIP_ON_INPUT: bool = getenv(
         nullable=True,
 ) == 'true'
 
+BOT_ATTEMPT_POLICY: str = getenv(
+        'BOT_ATTEMPT_POLICY',
+        'all',
+        nullable=True,
+        checks=[lambda val: val in ('all', 'first', 'best', 'last') or
+                            '{key} expected to be all, first, best or last, '
+                            'but received: "{val}"']
+)
+
+BOT_PREFETCH_SIZE: int = getenv(
+        'BOT_PREFETCH_SIZE',
+        '1',
+        nullable=True,
+        checks=[lambda val: val.isnumeric() or '{key} expected to receive a '
+                                               'numeric value, but received:'
+                                               ' "{val}"'],
+        transforms=[int]
+)
+
+BOT_CACHE_MAX_MB: int = getenv(
+        'BOT_CACHE_MAX_MB',
+        '512',
+        nullable=True,
+        checks=[lambda val: val.isnumeric() or '{key} expected to receive a '
+                                               'numeric value, but received:'
+                                               ' "{val}"'],
+        transforms=[int]
+)
+
 # Database Environment Variables
 
 DB_FILE: str = getenv(
@@ -113,7 +144,130 @@ TMDB_IMAGE_QUALITY: int = getenv(
         transforms=[int]
 )
 
+TMDB_IMAGE_FUSED_PIPELINE: bool = getenv(
+        'TMDB_IMAGE_FUSED_PIPELINE',
+        'true',
+        nullable=True
+) == 'true'
+
+TMDB_DOWNLOAD_WORKERS: int = getenv(
+        'TMDB_DOWNLOAD_WORKERS',
+        '4',
+        nullable=True,
+        checks=[lambda val: val.isnumeric() or '{key} expected to receive a '
+                                               'numeric value, but received:'
+                                               ' "{val}"'],
+        transforms=[int]
+)
+
+TMDB_DOWNLOAD_TIMEOUT: int = getenv(
+        'TMDB_DOWNLOAD_TIMEOUT',
+        '30',
+        nullable=True,
+        checks=[lambda val: val.isnumeric() or '{key} expected to receive a '
+                                               'numeric value, but received:'
+                                               ' "{val}"'],
+        transforms=[int]
+)
+
+TMDB_IMAGE_CENSOR_MODES: tuple[str, ...] = getenv(
+        'TMDB_IMAGE_CENSOR_MODES',
+        'canvas',
+        nullable=True,
+        checks=[lambda val: all(
+                mode.strip() in ('rects', 'canvas', 'pixelate', 'blur')
+                for mode in val.split(',')
+        ) or '{key} expected a comma separated list of rects, canvas, '
+             'pixelate or blur, but received: "{val}"'],
+        transforms=[lambda val: tuple(mode.strip() for mode in val.split(','))]
+)
+
+TMDB_HTTP_CONNECT_TIMEOUT: int = getenv(
+        'TMDB_HTTP_CONNECT_TIMEOUT',
+        '5',
+        nullable=True,
+        checks=[lambda val: val.isnumeric() or '{key} expected to receive a '
+                                               'numeric value, but received:'
+                                               ' "{val}"'],
+        transforms=[int]
+)
+
+TMDB_HTTP_READ_TIMEOUT: int = getenv(
+        'TMDB_HTTP_READ_TIMEOUT',
+        '15',
+        nullable=True,
+        checks=[lambda val: val.isnumeric() or '{key} expected to receive a '
+                                               'numeric value, but received:'
+                                               ' "{val}"'],
+        transforms=[int]
+)
+
+TMDB_HTTP_RETRIES: int = getenv(
+        'TMDB_HTTP_RETRIES',
+        '3',
+        nullable=True,
+        checks=[lambda val: val.isnumeric() or '{key} expected to receive a '
+                                               'numeric value, but received:'
+                                               ' "{val}"'],
+        transforms=[int]
+)
+
+TMDB_ASYNC_CANDIDATES: int = getenv(
+        'TMDB_ASYNC_CANDIDATES',
+        '3',
+        nullable=True,
+        checks=[lambda val: val.isnumeric() or '{key} expected to receive a '
+                                               'numeric value, but received:'
+                                               ' "{val}"'],
+        transforms=[int]
+)
+
+TMDB_BACKDROP_TTL: int = getenv(
+        'TMDB_BACKDROP_TTL',
+        '7',
+        nullable=True,
+        checks=[lambda val: val.isnumeric() or '{key} expected to receive a '
+                                               'numeric value, but received:'
+                                               ' "{val}"'],
+        transforms=[int]
+)
+
 # Bsky Environment Variables
 
 BSKY_HANDLE = getenv('BSKY_HANDLE')
 BSKY_PASSWORD = getenv('BSKY_PASSWORD')
+
+BSKY_SESSION_FILE: str = getenv(
+        'BSKY_SESSION_FILE',
+        'bsky.session',
+        nullable=True,
+        transforms=[str.strip,
+                    lambda val: val and path.join(ROOT_DIR, val)]
+)
+
+BSKY_JETSTREAM_URL: str = getenv(
+        'BSKY_JETSTREAM_URL',
+        '',
+        nullable=True,
+        transforms=[str.strip]
+)
+
+BSKY_IMAGE_MAX_BYTES: int = getenv(
+        'BSKY_IMAGE_MAX_BYTES',
+        '980000',
+        nullable=True,
+        checks=[lambda val: val.isnumeric() or '{key} expected to receive a '
+                                               'numeric value, but received:'
+                                               ' "{val}"'],
+        transforms=[int]
+)
+
+BSKY_IMAGE_FORMAT: str = getenv(
+        'BSKY_IMAGE_FORMAT',
+        'JPEG',
+        nullable=True,
+        checks=[lambda val: val.upper() in ('JPEG', 'WEBP') or
+                            '{key} expected to be JPEG or WEBP, but '
+                            'received: "{val}"'],
+        transforms=[str.upper]
+)
@@ -0,0 +1,59 @@
+""" import_catalog.py
+
+    Imports a TMDB daily ID export into the local movie catalog. Once
+    imported, the bot picks random movies from it instead of calling the
+    discover endpoint. Download the `movie_ids_MM_DD_YYYY.json.gz` file from
+    https://developer.themoviedb.org/docs/daily-id-exports and run:
+
+        $ python3 import_catalog.py movie_ids_10_18_2026.json.gz
+
+    Only the 10000 most popular movies are selected by default, see
+    `--max-movies`. The export has about a million movies, and the obscure
+    ones would otherwise make up most of the picks.
+
+    Author: João Iacillo <john@iacillo.dev.br>
+"""
+
+import argparse
+
+from bmg.catalog import DEFAULT_MAX_MOVIES, MovieCatalog
+from bmg.log import create_default_logger
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[2])
+    parser.add_argument('export', help='TMDB daily ID export file')
+    parser.add_argument(
+            '--db',
+            help='Database file. Defaults to the DB_FILE env. var'
+    )
+    parser.add_argument(
+            '--min-popularity',
+            type=float,
+            default=0,
+            help='Movies under this popularity are never selected'
+    )
+    parser.add_argument(
+            '--max-movies',
+            type=int,
+            default=DEFAULT_MAX_MOVIES,
+            help='Only this many of the most popular movies are selected. '
+                 'Defaults to %(default)s, 0 selects all of them'
+    )
+    args = parser.parse_args()
+
+    db_file = args.db
+    if db_file is None:
+        import config
+        db_file = config.DB_FILE
+
+    catalog = MovieCatalog(db_file, create_default_logger(True))
+    catalog.import_export(
+            args.export,
+            args.min_popularity,
+            args.max_movies
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -8,12 +8,16 @@
 
 import config
 
+from bmg.backdrops import BackdropIndex
+from bmg.blobcache import BlobCache
 from bmg.bsky import BskyClient
+from bmg.catalog import MovieCatalog
 from bmg.database import Database
 from bmg.game import Game, GameConfig
-from bmg.image import ImagePreparer
+from bmg.image import BudgetEncoder, ImagePreparer
 from bmg.log import create_default_logger
 from bmg.tmdb import TmdbClient
+from bmg.transport import HttpTransport
 
 logger = create_default_logger(config.BOT_DEBUG_MODE)
 
@@ -21,15 +25,62 @@ if config.BOT_DEBUG_MODE:
     logger.debug('Debug mode enabled')
 
 if __name__ == '__main__':
-    imgp = ImagePreparer(config.TMDB_IMAGE_QUALITY, logger)
+    blob_cache = None
+    if config.BOT_CACHE_MAX_MB:
+        blob_cache = BlobCache(config.BOT_CACHE_MAX_MB * 1024 * 1024, logger)
+
+    encoder = None
+    if config.BSKY_IMAGE_MAX_BYTES:
+        encoder = BudgetEncoder(
+                config.BSKY_IMAGE_MAX_BYTES,
+                config.BSKY_IMAGE_FORMAT,
+                config.TMDB_IMAGE_QUALITY
+        )
+
+    imgp = ImagePreparer(
+            config.TMDB_IMAGE_QUALITY,
+            logger,
+            config.TMDB_IMAGE_FUSED_PIPELINE,
+            encoder,
+            config.TMDB_IMAGE_CENSOR_MODES,
+            blob_cache
+    )
     db = Database(config.DB_FILE, logger)
-    tmdb = TmdbClient(config.TMDB_API_ACCESS_TOKEN)
-    bsky = BskyClient(config.BSKY_HANDLE, config.BSKY_PASSWORD, logger)
+
+    catalog = MovieCatalog(config.DB_FILE, logger)
+    if catalog.is_empty():
+        logger.info('Movie catalog is empty, using TMDB discover instead')
+        catalog = None
+
+    tmdb = TmdbClient(
+            config.TMDB_API_ACCESS_TOKEN,
+            config.TMDB_DOWNLOAD_WORKERS,
+            config.TMDB_DOWNLOAD_TIMEOUT,
+            catalog,
+            BackdropIndex(config.DB_FILE, logger, config.TMDB_BACKDROP_TTL),
+            HttpTransport(
+                    config.TMDB_HTTP_CONNECT_TIMEOUT,
+                    config.TMDB_HTTP_READ_TIMEOUT,
+                    config.TMDB_HTTP_RETRIES,
+                    max(10, config.TMDB_DOWNLOAD_WORKERS)
+            ),
+            config.TMDB_ASYNC_CANDIDATES,
+            blob_cache
+    )
+    bsky = BskyClient(
+            config.BSKY_HANDLE,
+            config.BSKY_PASSWORD,
+            logger,
+            config.BSKY_SESSION_FILE
+    )
 
     game_config = GameConfig(
             bsky=bsky, tmdb=tmdb, imgp=imgp, db=db, logger=logger,
             threshold=config.BOT_THRESHOLD,
-            skip_on_input=config.BOT_SKIP_ON_INPUT
+            skip_on_input=config.BOT_SKIP_ON_INPUT,
+            prefetch=config.BOT_PREFETCH_SIZE,
+            attempt_policy=config.BOT_ATTEMPT_POLICY,
+            jetstream_url=config.BSKY_JETSTREAM_URL
     )
 
     game = Game(game_config)